@@ -1,12 +1,27 @@
+import atexit
 import logging
 from flask import Flask, Response, request, redirect, render_template
 from json import dumps
 from os.path import exists
+from threading import Lock, Thread
 
 from flaskr.model.Itinerary import Itinerary
+from flaskr.model.RouteOptimizer import RouteOptimizer
+from flaskr.model.Weather import Weather
+from flaskr.model.data_access_layer.AsyncFanOut import AsyncFanOut
+from flaskr.model.data_access_layer.CircuitBreaker import CircuitBreaker
 from flaskr.model.data_access_layer.GeocodeAPIConnector import GeocodeApiConnector
+from flaskr.model.data_access_layer.GeocodeCache import GeocodeCache
+from flaskr.model.data_access_layer.HTTPClient import HTTPClient
+from flaskr.model.data_access_layer.ItineraryCache import ItineraryCache
 from flaskr.model.data_access_layer.ItineraryConnector import ItineraryConnector
+from flaskr.model.data_access_layer.RateLimiter import RateLimiter
+from flaskr.model.data_access_layer.SpatialIndex import SpatialIndex
+from flaskr.model.data_access_layer.SQLiteItineraryConnector import SQLiteItineraryConnector
 from flaskr.model.data_access_layer.WeatherAPIConnector import WeatherAPIConnector
+from flaskr.model.data_access_layer.WeatherCache import WeatherCache
+from flaskr.model.data_access_layer.WeatherRefresher import WeatherRefresher
+from flaskr.model.data_access_layer.WorkerPool import WorkerPool
 from flaskr.model.exceptions.ItineraryRequestException import ItineraryRequestException
 from flaskr.model.exceptions.RepeatLocationException import RepeatLocationException
 from flaskr.model.exceptions.LocationKeyException import LocationKeyException
@@ -14,7 +29,8 @@ from flaskr.model.exceptions.WeatherRequestException import WeatherRequestExcept
 from flaskr.model.exceptions.InvalidUnitException import InvalidUnitException
 from flaskr.model.exceptions.GeocodeRequestException import GeocodeRequestException
 from flaskr.model.exceptions.InvalidLocationException import InvalidLocationException
-from flaskr.controller.utils import error_response
+from flaskr.model.exceptions.InvalidItineraryException import InvalidItineraryException
+from flaskr.controller.utils import error_response, encode_cursor, decode_cursor, make_etag
 
 
 
@@ -61,6 +77,252 @@ OPEN_WEATHER_KEY = keys[1].strip().replace("\n", "")
 
 
 
+##################################################################################
+################################ Configuration ###################################
+##################################################################################
+
+
+
+# The itinerary storage engine, either "file" or "sqlite". Existing saves can be
+# copied into the database with: python -m flaskr.controller.manage import-sqlite
+ITINERARY_BACKEND = "file"
+
+# The folder in which itineraries are saved by the "file" engine.
+ITINERARY_DIR = "./itineraries"
+
+# The database in which itineraries are stored by the "sqlite" engine.
+ITINERARY_DB_FILE = "./itineraries.sqlite3"
+
+# The number of sub-folders per level of the sharded itinerary layout, saves are
+# stored directly in ITINERARY_DIR when 0. Existing saves can be moved with:
+# python -m flaskr.controller.manage migrate-shards
+ITINERARY_SHARD_FAN_OUT = 0
+
+# The number of levels of sub-folders in the sharded itinerary layout.
+ITINERARY_SHARD_DEPTH = 1
+
+# The format itineraries are saved in by the "file" engine, either "csv" or
+# "binary". Existing saves can be converted with:
+# python -m flaskr.controller.manage convert-format --to binary
+ITINERARY_SAVE_FORMAT = "csv"
+
+# The maximum number of itinerary names returned in a single page.
+ITINERARY_PAGE_LIMIT = 1000
+
+# The maximum number of itineraries retrieved by a single batch request.
+ITINERARY_BATCH_LIMIT = 1000
+
+# The memory budget of the parsed itinerary cache in bytes.
+ITINERARY_CACHE_SIZE = 64 * 1024 * 1024
+
+# The number of seconds cached weather data remains valid.
+WEATHER_CACHE_TTL = 600
+
+# The number of seconds expired weather data may still be served, with its age,
+# while it is refreshed in the background or OpenWeather is failing.
+WEATHER_CACHE_STALE = 3600
+
+# The maximum number of coordinates held in the weather cache.
+WEATHER_CACHE_SIZE = 4096
+
+# The number of decimal places coordinates are rounded to when cached (~1km).
+WEATHER_CACHE_PRECISION = 2
+
+# The number of weather requests per minute sent to refresh the weather at saved
+# itinerary locations before it expires, a share of the OpenWeather quota in
+# RATE_LIMITS. At most WEATHER_CACHE_TTL / 60 * WEATHER_REFRESH_RATE locations are
+# kept warm, the refresher is disabled when 0.
+WEATHER_REFRESH_RATE = 30
+
+# The number of seconds before it expires that cached weather data is refreshed.
+WEATHER_REFRESH_LEAD = 120
+
+# The number of seconds between passes over the saved itinerary locations.
+WEATHER_REFRESH_PERIOD = 60
+
+# The units the weather at saved itinerary locations is refreshed in.
+WEATHER_REFRESH_UNITS = ("metric",)
+
+# The distance in kilometres within which the coordinates of a bulk weather request
+# share a single upstream request.
+WEATHER_CLUSTER_RADIUS = 0.5
+
+# The number of worker threads shared by all bulk upstream requests.
+WORKER_POOL_SIZE = 32
+
+# The maximum number of worker threads a single request may occupy.
+WORKER_REQUEST_CONCURRENCY = 8
+
+# The maximum number of location names geocoded by a single bulk request.
+GEOCODE_BULK_LIMIT = 100
+
+# The SQLite database in which geocoding results are cached.
+GEOCODE_CACHE_FILE = "./cache/geocode.sqlite3"
+
+# The number of seconds cached geocoding results remain valid (30 days).
+GEOCODE_CACHE_TTL = 30 * 24 * 60 * 60
+
+# The number of seconds a location without geocoding results remains cached (1 hour).
+GEOCODE_CACHE_EMPTY_TTL = 60 * 60
+
+# The number of geocoding results cached between deletions of the expired entries.
+GEOCODE_CACHE_PURGE_INTERVAL = 1000
+
+# The maximum number of keep-alive connections held open per upstream host.
+HTTP_POOL_SIZE = 32
+
+# The number of seconds an upstream connection and response may take.
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 10
+
+# The number of seconds an upstream request may take including retries.
+HTTP_DEADLINE = 15
+
+# The maximum number of retries of a failed upstream request, and the base and
+# maximum number of seconds waited before a retry.
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.25
+HTTP_MAX_BACKOFF = 2
+
+# The number of consecutive failures after which an upstream host is refused, and
+# the number of seconds before it is tried again.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+
+# The quota of each upstream host: the number of requests per minute and the
+# number of requests which may be sent at once after a quiet period.
+RATE_LIMITS = {
+    "api.openweathermap.org" : (60, 60),
+    "maps.googleapis.com" : (3000, 3000)
+}
+
+# The maximum number of seconds a request may wait for its host's quota before it
+# is shed, requests may queue for as long as their deadline.
+RATE_LIMIT_MAX_WAIT = HTTP_DEADLINE
+
+# The SQLite database through which every worker process shares the quotas, the
+# quotas are tracked per process if None.
+RATE_LIMIT_FILE = None
+
+# The maximum number of upstream requests in flight on the asyncio event loop.
+FAN_OUT_CONCURRENCY = 100
+
+# The number of seconds an asyncio fan-out may take before it is abandoned.
+FAN_OUT_DEADLINE = 10
+
+# The number of coordinates or locations above which weather and geocoding
+# requests are sent on the event loop.
+FAN_OUT_THRESHOLD = 16
+
+# The number of seconds the route optimizer may spend improving a route.
+ROUTE_OPTIMIZER_BUDGET = 0.5
+
+# The maximum number of locations of an itinerary whose route may be optimized.
+ROUTE_OPTIMIZER_MAX_STOPS = 1000
+
+# The height and width in degrees of the cells of the saved location index.
+SPATIAL_INDEX_CELL_SIZE = 0.1
+
+# The largest radius in kilometres of a nearby location query.
+NEARBY_MAX_RADIUS = 100
+
+# The maximum number of locations returned by a nearby location query.
+NEARBY_LIMIT = 100
+
+# Whether the saved locations are indexed and their weather refreshed in the
+# background, the tasks are started by the first request rather than on import so
+# tools and tests can import the app without sending upstream requests.
+BACKGROUND_TASKS = True
+
+
+# The parsed itinerary cache is shared by every request for the lifetime of the app.
+itinerary_cache = ItineraryCache(ITINERARY_CACHE_SIZE)
+
+# The weather cache is shared by every request for the lifetime of the app.
+weather_cache = WeatherCache(WEATHER_CACHE_TTL, WEATHER_CACHE_SIZE, WEATHER_CACHE_PRECISION, WEATHER_CACHE_STALE)
+
+# The geocode cache persists between restarts of the app.
+geocode_cache = GeocodeCache(GEOCODE_CACHE_FILE, GEOCODE_CACHE_TTL, GEOCODE_CACHE_EMPTY_TTL,\
+                             GEOCODE_CACHE_PURGE_INTERVAL)
+
+# The worker pool is shared by every request for the lifetime of the app.
+worker_pool = WorkerPool(WORKER_POOL_SIZE, WORKER_REQUEST_CONCURRENCY)
+
+# The upstream connection pools and circuit breaker are shared by every connector.
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+rate_limiter = RateLimiter(RATE_LIMITS, RATE_LIMIT_MAX_WAIT, RATE_LIMIT_FILE)
+
+http_client = HTTPClient(HTTP_POOL_SIZE, circuit_breaker, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_DEADLINE,
+                         HTTP_RETRIES, HTTP_BACKOFF, HTTP_MAX_BACKOFF, rate_limiter)
+
+# The asyncio event loop is shared by every request for the lifetime of the app.
+fan_out = AsyncFanOut(FAN_OUT_CONCURRENCY, FAN_OUT_DEADLINE, http_client)
+
+# The route optimizer is shared by every request for the lifetime of the app.
+route_optimizer = RouteOptimizer(ROUTE_OPTIMIZER_BUDGET)
+
+# The saved location index is kept up to date by the itinerary connector.
+spatial_index = SpatialIndex(SPATIAL_INDEX_CELL_SIZE)
+
+# The itinerary connector is created once and reused by every request.
+itinerary_connector : ItineraryConnector | SQLiteItineraryConnector = None
+
+if ITINERARY_BACKEND == "sqlite" :
+
+    itinerary_connector = SQLiteItineraryConnector(ITINERARY_DB_FILE, itinerary_cache, spatial_index)
+
+else :
+
+    itinerary_connector = ItineraryConnector(ITINERARY_DIR, itinerary_cache, ITINERARY_SHARD_FAN_OUT,
+                                             ITINERARY_SHARD_DEPTH, save_format=ITINERARY_SAVE_FORMAT,
+                                             index=spatial_index)
+
+# The upstream API connectors are created once and reused by every request.
+geocode_connector = GeocodeApiConnector(GOOGLE_KEY, http_client, fan_out, geocode_cache, worker_pool)
+weather_connector = WeatherAPIConnector(OPEN_WEATHER_KEY, weather_cache, worker_pool, http_client, fan_out,
+                                        WEATHER_CLUSTER_RADIUS)
+
+# The weather at saved itinerary locations is refreshed in the background.
+weather_refresher = WeatherRefresher(weather_connector, itinerary_connector, spatial_index, WEATHER_REFRESH_RATE,
+                                     WEATHER_REFRESH_LEAD, WEATHER_REFRESH_PERIOD, WEATHER_REFRESH_UNITS)
+
+# The background tasks are started at most once.
+background_tasks_lock = Lock()
+background_tasks_started = False
+
+# The shared resources are released when the app exits.
+atexit.register(weather_refresher.stop)
+atexit.register(fan_out.close)
+atexit.register(http_client.close)
+atexit.register(worker_pool.shutdown)
+
+
+
+# This function starts the background tasks
+def start_background_tasks() -> None :
+
+    """
+    This function starts indexing the saved locations and refreshing the weather at
+    them in the background, only the first call has any effect.
+    """
+
+    global background_tasks_started
+
+    with background_tasks_lock :
+
+        if background_tasks_started :
+
+            return
+
+        background_tasks_started = True
+
+    # The saved locations are indexed in the background while the app starts serving.
+    Thread(target=spatial_index.build, args=(itinerary_connector,), daemon=True).start()
+
+    weather_refresher.start()
+
+
+
 ##################################################################################
 ############################# Create Flask App ##################################
 ##################################################################################
@@ -74,6 +336,21 @@ app.template_folder = "../view/templates"
 
 
 
+# The following function starts the background tasks when the first request arrives
+@app.before_request
+def background_tasks_hook() -> None:
+
+    """
+    This function starts the background tasks before the first request is handled,
+    unless they are disabled by BACKGROUND_TASKS.
+    """
+
+    if BACKGROUND_TASKS and not background_tasks_started :
+
+        start_background_tasks()
+
+
+
 ##################################################################################
 ################################## Exceptions ####################################
 ##################################################################################
@@ -160,6 +437,24 @@ def invalid_location_handler(e : InvalidLocationException) -> Response:
 
 
 
+@app.errorhandler(InvalidItineraryException)
+def invalid_itinerary_handler(e : InvalidItineraryException) -> Response:
+
+    """
+    This function handles exceptions thrown by the Itinerary class when one or
+    more locations of a bulk constructed itinerary are invalid.
+
+    Parameters:
+        e (InvalidItineraryException): Custom exception class.
+
+    Returns: 
+        Response: a json encoded HTTP 400 response containing an error message.
+    """
+
+    return error_response(e.__str__(), 400)
+
+
+
 @app.errorhandler(InvalidUnitException)
 def weather_request_handler(e : InvalidUnitException) -> Response:
 
@@ -327,9 +622,7 @@ def get_coordinates(location : str)  -> Response:
     else :
 
         # Coordinates are retrieved from google geocoding api
-        connector = GeocodeApiConnector(GOOGLE_KEY)
-
-        coordinates = connector.request_coordinates(location)
+        coordinates = geocode_connector.request_coordinates(location)
 
         response = Response(dumps({"coordinates" : coordinates}), 200)
 
@@ -341,23 +634,131 @@ def get_coordinates(location : str)  -> Response:
 
 
 
+@app.route("/api/geocode", methods=["POST"])
+def bulk_coordinates()  -> Response:
+
+    """
+    API HTTP POST endpoint handler - retrieves the coordinates corresponding to
+    many location names at once.
+
+    Request Body: 
+        locations (list[str]): The plain text location names, descriptions or
+        addresses.
+
+    Returns:
+        Response: A json encoded HTTP 200 response containing the coordinates of
+        each location found and the error of each location which wasn't.
+    """
+
+    # Request body retrieved
+    data = request.json
+
+    response = None
+
+    # Request validation
+    if (not isinstance(data, dict)) or (not isinstance(data.get("locations", None), list)) \
+        or any(not isinstance(i, str) or i == "" for i in data["locations"]) :
+        
+        response = error_response("Invalid request, the locations (list of non-empty strings) are required.", 400)
+
+    elif len(data["locations"]) > GEOCODE_BULK_LIMIT :
+
+        response = error_response(f"Invalid request, at most {GEOCODE_BULK_LIMIT} locations may be requested.", 400)
+
+    else :
+
+        # Coordinates are retrieved from google geocoding api, many locations are
+        # requested on the event loop
+        if len(data["locations"]) > FAN_OUT_THRESHOLD :
+
+            results = geocode_connector.fan_out_coordinates(data["locations"])
+
+        else :
+
+            results = geocode_connector.bulk_coordinates(data["locations"])
+
+        response = Response(dumps({
+            "coordinates" : {location : result for location, result in results.items() \
+                             if not isinstance(result, Exception)},
+            "errors" : {location : result.__str__() for location, result in results.items() \
+                        if isinstance(result, Exception)}
+            }), 200)
+
+    response.access_control_allow_origin = "*"
+    response.content_language = "en"
+    response.content_type = "application/json"
+
+    return response
+
+
+
 @app.route("/api/itineraries", methods=["GET"])
 def get_itinerary_names()  -> Response:
 
     """
-    API HTTP GET endpoint handler - retrieves a list of valid itinerary names.
+    API HTTP GET endpoint handler - retrieves a sorted list of valid itinerary names.
+
+    URL Parameters:
+        prefix (str): Optional parameter, only names starting with the prefix are listed.
+        limit (int): Optional parameter, the maximum number of names in the page.
+        cursor (str): Optional parameter, the "next" value of the previous page.
+        order (str): Optional parameter, the sort order either "asc" or "desc".
 
     Returns:
         Response: A json encoded HTTP 200 response containing a list of valid
-        itinerary names.
+        itinerary names and the cursor of the next page.
     """
 
-    # The itinerary names are retrieved.
-    connector = ItineraryConnector("./itineraries")
+    # GET request's url paramters are retrieved
+    prefix = request.args.get("prefix", "")
+    limit = request.args.get("limit", None)
+    cursor = request.args.get("cursor", None)
+    order = request.args.get("order", "asc")
+
+    response = None
+
+    # Request validation
+    if order not in {"asc", "desc"} :
+
+        response = error_response("Invalid request, the order parameter must be asc or desc.", 400)
+
+    else :
+
+        # The page size is safely cast to an integer
+        if limit != None :
+
+            try :
+
+                limit = min(int(limit), ITINERARY_PAGE_LIMIT)
+
+            except ValueError as e :
+
+                raise ValueError("Invalid request, the limit parameter must be an integer.")
+
+        if cursor != None :
 
-    itinerary_names = connector.get_names()
+            cursor = decode_cursor(cursor)
 
-    response = Response(dumps({"itineraries" : itinerary_names}), 200)
+        # The page is only retrieved if the client's copy is out of date
+        etag = make_etag("names", itinerary_connector.names_digest(), prefix, cursor, limit, order)
+
+        if request.if_none_match.contains(etag) :
+
+            response = Response(status=304)
+
+        else :
+
+            # The itinerary names are retrieved.
+            itinerary_names, last = itinerary_connector.page_names(prefix, cursor, limit, order == "desc")
+
+            response = Response(dumps({
+                "itineraries" : itinerary_names,
+                "next" : encode_cursor(last) if last != None else None
+                }), 200)
+
+        # The client must revalidate its copy before re-using it
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
 
     # Set the response headers
     response.access_control_allow_origin = "*"
@@ -391,15 +792,136 @@ def get_itinerary(name : str)  -> Response:
 
     else :
 
-        # The itinary data is retrieved from a file
-        connector = ItineraryConnector("./itineraries")
+        # Viewed itineraries have their weather refreshed first
+        weather_refresher.viewed(name)
 
-        itinerary = connector.read(name)
+        # The itinerary is only read if the client's copy is out of date
+        etag = make_etag("itinerary", name, itinerary_connector.version(name))
 
-        response = Response(dumps({
-            "center" : itinerary.center, 
-            "coordinates" : itinerary.coordinates
-            }), 200)
+        if request.if_none_match.contains(etag) :
+
+            response = Response(status=304)
+
+        else :
+
+            # The itinary data is retrieved from a file
+            itinerary = itinerary_connector.read(name)
+
+            response = Response(dumps({
+                "center" : itinerary.center, 
+                "coordinates" : itinerary.coordinates
+                }), 200)
+
+        # The client must revalidate its copy before re-using it
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+
+    # Set the response headers
+    response.access_control_allow_origin = "*"
+    response.content_language = "en"
+    response.content_type = "application/json"
+
+    return response
+
+
+
+@app.route("/api/itineraries/<name>/summary", methods=["GET"])
+def get_itinerary_summary(name : str)  -> Response:
+
+    """
+    API HTTP GET endpoint handler - retrieves the number of locations and the
+    center of a specific itinerary, the locations of a binary save aren't parsed.
+
+    URL Parameters: 
+        name (str): The name of the itinerary.
+
+    Returns:
+        Response: A json encoded HTTP 200 response containing the itinerary summary.
+    """
+
+    response = None
+
+    # Request validation
+    if name == None or name == "":
+        
+        response = error_response("Invalid request, the name parameter was missing", 400)
+
+    else :
+
+        # The summary is only read if the client's copy is out of date
+        etag = make_etag("summary", name, itinerary_connector.version(name))
+
+        if request.if_none_match.contains(etag) :
+
+            response = Response(status=304)
+
+        else :
+
+            # Only the header of the save is read
+            count, center = itinerary_connector.read_header(name)
+
+            response = Response(dumps({
+                "center" : center, 
+                "count" : count
+                }), 200)
+
+        # The client must revalidate its copy before re-using it
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+
+    # Set the response headers
+    response.access_control_allow_origin = "*"
+    response.content_language = "en"
+    response.content_type = "application/json"
+
+    return response
+
+
+
+@app.route("/api/itineraries/<name>/optimize", methods=["GET"])
+def optimize_itinerary(name : str)  -> Response:
+
+    """
+    API HTTP GET endpoint handler - retrieves a specific itinerary with its
+    locations re-ordered to shorten the route between them, the saved itinerary
+    isn't modified.
+
+    URL Parameters: 
+        name (str): The name of the itinerary.
+
+    Returns:
+        Response: A json encoded HTTP 200 response containing the re-ordered
+        itinerary data and the length of its route in kilometres.
+    """
+
+    response = None
+
+    # Request validation
+    if name == None or name == "":
+        
+        response = error_response("Invalid request, the name parameter was missing", 400)
+
+    else :
+
+        # The itinary data is retrieved
+        itinerary = itinerary_connector.read(name)
+
+        # The size of the itinerary is validated, the distance matrix grows with the
+        # square of the number of locations.
+        if len(itinerary) > ROUTE_OPTIMIZER_MAX_STOPS :
+
+            response = error_response("Invalid request, the route of an itinerary with more than " +\
+                                      f"{ROUTE_OPTIMIZER_MAX_STOPS} locations cannot be optimized", 400)
+
+        else :
+
+            itinerary, distance = route_optimizer.optimize(itinerary)
+
+            response = Response(dumps({
+                "center" : itinerary.center, 
+                "coordinates" : itinerary.coordinates,
+                "distance" : distance
+                }), 200)
 
     # Set the response headers
     response.access_control_allow_origin = "*"
@@ -410,6 +932,76 @@ def get_itinerary(name : str)  -> Response:
 
 
 
+@app.route("/api/itineraries/batch", methods=["POST"])
+def get_itinerary_batch()  -> Response:
+
+    """
+    API HTTP POST endpoint handler - retrieves the itinerary data for many
+    itineraries at once. The itineraries are read concurrently on the worker pool
+    and streamed back in the requested order as they are read.
+
+    Request Body: 
+        names (list[str]): The names of the itineraries.
+
+    Returns:
+        Response: A newline delimited json HTTP 200 response with a line per
+        itinerary, containing either its data or the error raised reading it.
+    """
+
+    # Request body retrieved
+    data = request.json
+
+    response = None
+
+    # Request validation
+    if (not isinstance(data, dict)) or (not isinstance(data.get("names", None), list)) \
+        or any(not isinstance(i, str) or i == "" for i in data["names"]) :
+
+        response = error_response("Invalid request, the names (list of non-empty strings) are required.", 400)
+
+    elif len(data["names"]) > ITINERARY_BATCH_LIMIT :
+
+        response = error_response(f"Invalid request, at most {ITINERARY_BATCH_LIMIT} itineraries may be requested.", 400)
+
+    else :
+
+        # Repeated names are removed
+        names = list(dict.fromkeys(data["names"]))
+
+        # Each itinerary is serialized as soon as it and those before it are read
+        def generate() :
+
+            for name, future in zip(names, worker_pool.imap(itinerary_connector.read, [(name,) for name in names])) :
+
+                exception = future.exception()
+
+                # Missing and corrupted itineraries are reported individually
+                if exception == None :
+
+                    itinerary = future.result()
+
+                    line = {"name" : name, "center" : itinerary.center, "coordinates" : itinerary.coordinates}
+
+                elif isinstance(exception, ItineraryRequestException) :
+
+                    line = {"name" : name, "error" : exception.__str__()}
+
+                else :
+
+                    line = {"name" : name, "error" : "The server experienced an error while reading this itinerary."}
+
+                yield dumps(line) + "\n"
+
+        response = Response(generate(), 200, content_type="application/x-ndjson")
+
+    # Set the response headers
+    response.access_control_allow_origin = "*"
+    response.content_language = "en"
+
+    return response
+
+
+
 @app.route("/api/itineraries", methods=["POST"])
 def create_itinerary()  -> Response:
 
@@ -437,18 +1029,11 @@ def create_itinerary()  -> Response:
 
     else :
 
-        itinerary = Itinerary()
+        # The locations in the itinerary are validated and added as a single batch
+        itinerary = Itinerary.from_records(data["coordinates"])
 
-        # The locations in the interary are added to the data structure
-        for location in data["coordinates"] :
-
-            itinerary[location[0]] = (location[1], location[2])
-
-        
         # The itinary object is saved to a file
-        connector = ItineraryConnector("./itineraries")
-
-        connector.write(data["name"], itinerary)
+        itinerary_connector.write(data["name"], itinerary)
 
         response = Response(status=204)
 
@@ -482,9 +1067,7 @@ def delete_itinerary(name : str)  -> Response:
     else :
 
         # The itinary save file is deleted
-        connector = ItineraryConnector("./itineraries")
-
-        connector.delete(name)
+        itinerary_connector.delete(name)
 
         response = Response(status=204)
 
@@ -498,6 +1081,94 @@ def delete_itinerary(name : str)  -> Response:
 
 # The following function handles api GET requests for current weather data
 # it can handle one or more simultaneous requests
+def retrieve_weather(latitudes : list[float], longitudes : list[float], units : str) -> list[dict] :
+    """
+    This function retrieves the weather data for any number of coordinates, many
+    coordinates are requested on the event loop and a threaded bulk request is
+    used when more than one coordinate is requested. The coordinates whose weather
+    couldn't be retrieved are reported with an error.
+
+    Parameters:
+        latitudes (list[float]): The latitudes of the desired locations.
+        longitudes (list[float]): The longitudes of the desired locations.
+        units (str): The units to be used.
+
+    Returns:
+        list[dict]: the json encodable weather data of each coordinate in order.
+    """
+
+    weather_list = []
+
+    if len(latitudes) > FAN_OUT_THRESHOLD or len(longitudes) > FAN_OUT_THRESHOLD :
+
+        weather_list = weather_connector.fan_out_weather(latitudes, longitudes, units)
+
+    elif len(latitudes) > 1 or len(longitudes) > 1 :
+
+        weather_list = weather_connector.bulk_weather(latitudes, longitudes, units)
+
+    else :
+
+        weather_list = [weather_connector.current_weather(latitudes[0], longitudes[0], units)]
+
+    return [weather.__dict__ if isinstance(weather, Weather) else \
+            {"coordinates" : [latitude, longitude], "error" : weather.__str__()} \
+            for weather, latitude, longitude in zip(weather_list, latitudes, longitudes)]
+
+
+
+@app.route("/api/itineraries/<name>/weather", methods=["GET"])
+def get_itinerary_weather(name : str)  -> Response:
+    """
+    API HTTP GET endpoint handler - retrieves the itinerary data for a specific
+    itinerary together with the weather data of each of its locations.
+
+    URL Parameters:
+        name (str): The name of the itinerary.
+        units (str): Optional parameter specifying the units to be used.
+
+    Returns:
+        Response: json encoded itinerary and weather data in HTTP 200 response.
+    """
+
+    units = request.args.get("units", "metric")
+
+    response = None
+
+    # Request validation
+    if name == None or name == "":
+        
+        response = error_response("Invalid request, the name parameter was missing", 400)
+
+    else :
+
+        # The coordinates are resolved from the stored itinerary
+        itinerary = itinerary_connector.read(name)
+
+        # Viewed itineraries have their weather refreshed first
+        weather_refresher.viewed(name)
+
+        weather = []
+
+        if len(itinerary) > 0 :
+
+            weather = retrieve_weather(list(itinerary.latitudes), list(itinerary.longitudes), units)
+
+        response = Response(dumps({
+            "center" : itinerary.center, 
+            "coordinates" : itinerary.coordinates,
+            "weather-data" : weather
+            }), 200)
+
+    # Set the response headers
+    response.access_control_allow_origin = "*"
+    response.content_language = "en"
+    response.content_type = "application/json"
+
+    return response
+
+
+
 @app.route("/api/weather", methods=["GET"])
 def get_weather()  -> Response:
     """
@@ -529,9 +1200,6 @@ def get_weather()  -> Response:
         
     else :
 
-        # Weather data is retrieved from the OpenWeather API
-        connector = WeatherAPIConnector(OPEN_WEATHER_KEY)
-
         # The input parameters are safely cast to float values
         try:
 
@@ -543,14 +1211,76 @@ def get_weather()  -> Response:
             raise TypeError("The latitudes and longitudes must be valid numerical values (floats).")
             
 
-        # Threaded bulk request is used when more than coordinate is requested
-        if len(latitudes) > 1 or len(longitudes) > 1 :
-            
-            response = Response(dumps({"weather-data" : [i.__dict__ for i in connector.bulk_weather(latitudes, longitudes, units)]}), 200)
-            
+        # Weather data is retrieved from the OpenWeather API
+        response = Response(dumps({"weather-data" : retrieve_weather(latitudes, longitudes, units)}), 200)
+
+    # Set the response headers
+    response.access_control_allow_origin = "*"
+    response.content_language = "en"
+    response.content_type = "application/json"
+
+    return response
+
+
+@app.route("/api/locations/nearby", methods=["GET"])
+def get_nearby_locations()  -> Response:
+    """
+    API HTTP GET endpoint handler - retrieves the saved itinerary locations
+    within a radius of a point, nearest first.
+
+    URL Parameters:
+        lat (float): The latitude of the point.
+        lng (float): The longitude of the point.
+        radius (float): The radius in kilometres.
+        limit (int): Optional parameter, the maximum number of locations returned.
+
+    Returns:
+        Response: json encoded locations in HTTP 200 response.
+    """
+
+    # GET request's url paramters are retrieved
+    latitude = request.args.get("lat", None)
+    longitude = request.args.get("lng", None)
+    radius = request.args.get("radius", None)
+    limit = request.args.get("limit", NEARBY_LIMIT)
+
+    response = None
+
+    # Request validation
+    if latitude == None or longitude == None or radius == None :
+        
+        response = error_response("Invalid request, the lat, lng and radius parameters are required.", 400)
+        
+    else :
+
+        # The input parameters are safely cast to numerical values
+        try:
+
+            latitude = float(latitude)
+            longitude = float(longitude)
+            radius = float(radius)
+            limit = int(limit)
+
+        except ValueError as e :
+
+            raise TypeError("The lat, lng and radius must be valid numerical values (floats) and the limit an integer.")
+
+        if radius > NEARBY_MAX_RADIUS or limit <= 0 or limit > NEARBY_LIMIT :
+
+            response = error_response(f"Invalid request, the radius must be at most {NEARBY_MAX_RADIUS}km" +\
+                                      f" and the limit between 1 and {NEARBY_LIMIT}.", 400)
+
         else :
 
-            response = Response(dumps({"weather-data" : [connector.current_weather(latitudes[0], longitudes[0], units).__dict__]}), 200)
+            locations = spatial_index.nearby(latitude, longitude, radius, limit)
+
+            response = Response(dumps({"locations" : [{
+                "itinerary" : location[0],
+                "name" : location[1],
+                "lat" : location[2],
+                "lng" : location[3],
+                "distance" : location[4]
+                } for location in locations]}), 200)
 
     # Set the response headers
     response.access_control_allow_origin = "*"
@@ -560,6 +1290,7 @@ def get_weather()  -> Response:
     return response
 
 
+
 ##################################################################################
 ################################## Page Routes ###################################
 ##################################################################################
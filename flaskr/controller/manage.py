@@ -0,0 +1,125 @@
+from argparse import ArgumentParser, Namespace
+
+from flaskr.model.data_access_layer.ItineraryConnector import ItineraryConnector
+from flaskr.model.data_access_layer.SQLiteItineraryConnector import SQLiteItineraryConnector
+
+
+
+##################################################################################
+################################## Commands ######################################
+##################################################################################
+
+
+
+def migrate_shards(arguments : Namespace) -> None :
+
+    """
+    This function moves the itinerary saves in the saves folder into the sharded
+    layout, the app may keep serving requests while saves are moved.
+
+    Parameters:
+        arguments (Namespace): the parsed command line arguments.
+    """
+
+    connector = ItineraryConnector(arguments.dir, shard_fan_out=arguments.fan_out,
+                                   shard_depth=arguments.depth)
+
+    moved = connector.migrate(arguments.limit)
+
+    print(f"{moved} itineraries were moved into the sharded layout.")
+
+
+
+def convert_format(arguments : Namespace) -> None :
+
+    """
+    This function re-writes every itinerary save in the requested save format.
+
+    Parameters:
+        arguments (Namespace): the parsed command line arguments.
+    """
+
+    connector = ItineraryConnector(arguments.dir, shard_fan_out=arguments.fan_out,
+                                   shard_depth=arguments.depth, save_format=arguments.to)
+
+    converted = connector.convert(arguments.limit)
+
+    print(f"{converted} itineraries were converted to the {arguments.to} format.")
+
+
+
+def import_sqlite(arguments : Namespace) -> None :
+
+    """
+    This function copies every itinerary save into the SQLite itinerary database.
+
+    Parameters:
+        arguments (Namespace): the parsed command line arguments.
+    """
+
+    source = ItineraryConnector(arguments.dir, shard_fan_out=arguments.fan_out,
+                                shard_depth=arguments.depth)
+
+    connector = SQLiteItineraryConnector(arguments.db)
+
+    imported, failed = connector.import_saves(source, arguments.batch_size)
+
+    print(f"{imported} itineraries were imported into {arguments.db}.")
+
+    for name in failed :
+
+        print(f"The itinerary {name} could not be read and was skipped.")
+
+
+
+##################################################################################
+############################### Command Parsing ##################################
+##################################################################################
+
+
+
+parser = ArgumentParser(description="Itinerary store maintenance commands.")
+commands = parser.add_subparsers(required=True)
+
+
+# The sharded layout migration command
+migrate_parser = commands.add_parser("migrate-shards", help="Move saves into the sharded layout.")
+migrate_parser.add_argument("--dir", default="./itineraries", help="The itinerary saves folder.")
+migrate_parser.add_argument("--fan-out", type=int, default=256, help="The number of sub-folders per level.")
+migrate_parser.add_argument("--depth", type=int, default=1, help="The number of levels of sub-folders.")
+migrate_parser.add_argument("--limit", type=int, default=None, help="The maximum number of saves to move.")
+migrate_parser.set_defaults(command=migrate_shards)
+
+
+# The save format conversion command
+convert_parser = commands.add_parser("convert-format", help="Re-write saves in another save format.")
+convert_parser.add_argument("--dir", default="./itineraries", help="The itinerary saves folder.")
+convert_parser.add_argument("--fan-out", type=int, default=0, help="The number of sub-folders per level.")
+convert_parser.add_argument("--depth", type=int, default=1, help="The number of levels of sub-folders.")
+convert_parser.add_argument("--to", choices=["csv", "binary"], default="binary", help="The save format.")
+convert_parser.add_argument("--limit", type=int, default=None, help="The maximum number of saves to convert.")
+convert_parser.set_defaults(command=convert_format)
+
+
+# The SQLite import command
+import_parser = commands.add_parser("import-sqlite", help="Copy saves into the SQLite database.")
+import_parser.add_argument("--dir", default="./itineraries", help="The itinerary saves folder.")
+import_parser.add_argument("--fan-out", type=int, default=0, help="The number of sub-folders per level.")
+import_parser.add_argument("--depth", type=int, default=1, help="The number of levels of sub-folders.")
+import_parser.add_argument("--db", default="./itineraries.sqlite3", help="The SQLite database file.")
+import_parser.add_argument("--batch-size", type=int, default=500, help="The number of saves per transaction.")
+import_parser.set_defaults(command=import_sqlite)
+
+
+
+##################################################################################
+################################# Application Start ##############################
+##################################################################################
+
+
+# Conditionally run the requested command
+if __name__ == "__main__" :
+
+    arguments = parser.parse_args()
+
+    arguments.command(arguments)
@@ -1,5 +1,8 @@
+from base64 import b64decode, urlsafe_b64encode
 from flask import Response
+from hashlib import sha1
 from json import dumps
+from typing import Hashable
 
 
 # This function constructs a basic json error response
@@ -27,3 +30,63 @@ def error_response(message : str, status : int) -> Response :
     return response
 
 
+
+# This function encodes a pagination cursor
+def encode_cursor(name : str) -> str :
+
+    """
+    This function encodes the last name of a page as an opaque url-safe cursor.
+
+    Parameters:
+        name (str): the last name of a page.
+
+    Returns: 
+        str: the encoded cursor.
+    """
+
+    return urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
+
+
+
+# This function decodes a pagination cursor
+def decode_cursor(cursor : str) -> str :
+
+    """
+    This function decodes a cursor created by encode_cursor.
+
+    Parameters:
+        cursor (str): the encoded cursor.
+
+    Returns: 
+        str: the last name of the previous page.
+    """
+
+    # Stripped padding is restored, any other character outside the url-safe
+    # alphabet makes the cursor invalid rather than being silently dropped
+    try :
+
+        padded = cursor.encode("ascii") + b"=" * (-len(cursor) % 4)
+
+        return b64decode(padded, altchars=b"-_", validate=True).decode("utf-8")
+
+    except ValueError as e :
+
+        raise ValueError("Invalid request, the cursor parameter is invalid.")
+
+
+
+# This function generates an entity tag
+def make_etag(*parts : Hashable) -> str :
+
+    """
+    This function generates a strong entity tag from the version of a resource and
+    the request parameters which shape its representation.
+
+    Parameters:
+        parts (Hashable): the version and parameters, each with a stable repr.
+
+    Returns: 
+        str: the unquoted entity tag.
+    """
+
+    return sha1(repr(parts).encode("utf-8", "surrogateescape")).hexdigest()
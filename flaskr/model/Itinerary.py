@@ -1,26 +1,203 @@
-from typing import Iterator
+from array import array
+from sys import getsizeof
+from typing import Iterable, Iterator, Sequence
 import math
 
+import numpy
+
 from flaskr.model.exceptions.RepeatLocationException import RepeatLocationException
 from flaskr.model.exceptions.LocationKeyException import LocationKeyException
 from flaskr.model.exceptions.InvalidLocationException import InvalidLocationException
+from flaskr.model.exceptions.InvalidItineraryException import InvalidItineraryException
 
 
 class Itinerary :
     """
     The Itinerary class encapsulates a list of location names and coordinates
-    in a first-to-last ordered array.
+    in a first-to-last ordered array. The latitudes and longitudes are stored in
+    contiguous arrays of doubles rather than as a Python object per location, and
+    the sums of their (x, y, z) cartesian coordinates are kept up to date so the
+    center can be found without revisiting every location. The index of location
+    names is only built once a location is looked up by name.
     """
 
 
+    __slots__ = ("names", "latitudes", "longitudes", "locations", "x", "y", "z")
+
+
     def __init__(self) -> None :
         """
         Itinerary object initializer
         """
 
-        self.coordinates : list[tuple[str, float, float]] = list()
-        self.locations : dict[str, int] = dict()
-        self.center : tuple[float, float] = tuple()
+        self.names : list[str] = list()
+        self.latitudes : array = array("d")
+        self.longitudes : array = array("d")
+        self.locations : dict[str, int] | None = None
+
+        # The running sums of the cartesian coordinates of every location
+        self.x : float = 0.0
+        self.y : float = 0.0
+        self.z : float = 0.0
+
+
+    @classmethod
+    def from_records(cls, records : Iterable[Sequence]) -> "Itinerary" :
+        """
+        This method builds an itinerary from a batch of (name, latitude, longitude)
+        records, every record is validated before any location is stored.
+
+        Parameters:
+            records (Iterable[Sequence]): the locations in order.
+
+        Returns:
+            Itinerary: the itinerary of the given locations.
+        """
+
+        records = list(records)
+
+        # The shape of every record is validated, the records are only checked
+        # individually if the batch is malformed
+        if not (set(map(type, records)) <= {list, tuple} and set(map(len, records)) <= {3}) :
+
+            malformed = [i for i, record in enumerate(records) \
+                         if not isinstance(record, (list, tuple)) or len(record) != 3]
+
+            if len(malformed) > 0 :
+
+                raise InvalidItineraryException([f"location {i + 1} must be [name, latitude, longitude]" \
+                                                 for i in malformed])
+
+        names, latitudes, longitudes = zip(*records) if len(records) > 0 else ((), (), ())
+
+        return cls.from_columns(names, latitudes, longitudes)
+
+
+    @classmethod
+    def from_columns(cls, names : Sequence[str], latitudes : Sequence[float], \
+                     longitudes : Sequence[float]) -> "Itinerary" :
+        """
+        This method builds an itinerary from columns of location names, latitudes and
+        longitudes. The columns are validated as a whole with NumPy and every invalid
+        location is reported by a single exception, the cartesian sums are then
+        accumulated in one batch rather than per location.
+
+        Parameters:
+            names (Sequence[str]): the location names in order.
+            latitudes (Sequence[float]): the latitudes of the locations.
+            longitudes (Sequence[float]): the longitudes of the locations.
+
+        Returns:
+            Itinerary: the itinerary of the given locations.
+        """
+
+        # The columns must describe the same locations
+        if not len(names) == len(latitudes) == len(longitudes) :
+
+            raise InvalidItineraryException(["the names, latitudes and longitudes differ in length"])
+
+        names = list(names)
+        errors = dict()
+
+        # The columns are validated, the type checks run before the range checks. The
+        # types of a whole column are checked at once, the values are only checked
+        # individually if the column is invalid.
+        if not set(map(type, names)) <= {str} :
+
+            for i in [i for i, name in enumerate(names) if not isinstance(name, str)] :
+
+                errors.setdefault(i, f"location {i + 1} must have a string name")
+
+        columns = []
+
+        for column, label, bound in ((latitudes, "latitude", 90), (longitudes, "longitude", 180)) :
+
+            # Arrays of doubles are viewed without being copied or checked
+            if isinstance(column, array) and column.typecode == "d" :
+
+                values = numpy.frombuffer(column, dtype=numpy.float64)
+
+            elif set(map(type, column)) <= {float} :
+
+                values = numpy.fromiter(column, dtype=numpy.float64, count=len(column))
+
+            else :
+
+                for i in [i for i, value in enumerate(column) if not isinstance(value, float)] :
+
+                    errors.setdefault(i, f"location {i + 1} must have a float {label}")
+
+                # The values which aren't floats have already been rejected
+                values = numpy.fromiter((value if isinstance(value, float) else 0.0 for value in column),
+                                        dtype=numpy.float64, count=len(column))
+
+            # Infinite, NaN and out of range values are found by a single mask
+            for i in numpy.flatnonzero(~numpy.isfinite(values) | (numpy.abs(values) > bound)).tolist() :
+
+                errors.setdefault(i, f"location {i + 1} has an invalid {label} {column[i]}")
+
+            columns.append(values)
+
+        # Duplicate names are found by sorting the hashes of the names, the repeats are
+        # only located name by name if a hash is repeated
+        hashes = numpy.fromiter(map(hash, names), dtype=numpy.int64, count=len(names)) \
+            if len(errors) == 0 else numpy.zeros(0, dtype=numpy.int64)
+
+        if len(errors) > 0 or len(numpy.unique(hashes)) < len(names) :
+
+            seen = set()
+
+            for i, name in enumerate(names) :
+
+                if i not in errors :
+
+                    if name in seen :
+
+                        errors[i] = f"location {i + 1} repeats the name {name}"
+
+                    seen.add(name)
+
+        if len(errors) > 0 :
+
+            raise InvalidItineraryException([errors[i] for i in sorted(errors)])
+
+        itinerary = cls()
+
+        itinerary.names = names
+        itinerary.latitudes = array("d", columns[0].tobytes())
+        itinerary.longitudes = array("d", columns[1].tobytes())
+
+        itinerary.accumulate(columns[0], columns[1])
+
+        return itinerary
+
+
+    @property
+    def coordinates(self) -> list[tuple[str, float, float]] :
+        """
+        This property generates the list of location names and coordinates.
+
+        Returns:
+            list[tuple[str, float, float]]: the locations in order.
+        """
+
+        return list(zip(self.names, self.latitudes, self.longitudes))
+
+
+    def name_index(self) -> dict[str, int] :
+        """
+        This method retrieves the index of the location names, it is built on first
+        use since most itineraries are only iterated.
+
+        Returns:
+            dict[str, int]: the position of each location by name.
+        """
+
+        if self.locations == None :
+
+            self.locations = dict(zip(self.names, range(len(self.names))))
+
+        return self.locations
 
 
     def __getitem__(self, location : str) -> tuple[str, float, float] :
@@ -42,13 +219,13 @@ class Itinerary :
         # Handle scenario where location can't be retrieved.
         try :
 
-            entry = self.coordinates[self.locations[location]]
+            index = self.name_index()[location]
 
         except KeyError :
 
             raise LocationKeyException(location)
 
-        return entry
+        return (self.names[index], self.latitudes[index], self.longitudes[index])
     
 
     def __setitem__(self, location : str, coordinates : tuple[float, float]) -> None :
@@ -72,59 +249,85 @@ class Itinerary :
 
             raise InvalidLocationException(coordinates)
 
+        locations = self.name_index()
+
         # Conditional assigns location and coordinates if location doesn't already exist.
-        if location in self.locations :
+        if location in locations :
             
             # An exception is raised if a location is a duplicate
             raise RepeatLocationException(location)
         
         else :
         
-            self.coordinates.append((location, coordinates[0], coordinates[1]))
-            self.locations[location] = len(self.coordinates)
+            locations[location] = len(self.names)
+            self.names.append(location)
+            self.latitudes.append(coordinates[0])
+            self.longitudes.append(coordinates[1])
 
+            # The location is converted from latitude and longitude to (x, y, z)
+            latitude = math.radians(coordinates[0])
+            longitude = math.radians(coordinates[1])
+            cos_latitude = math.cos(latitude)
 
-    def find_center(self)  -> tuple[float, float]:
-        """
-        This method calculates the center point of all the coordinates in the itinerary,
-        this is for mapping purposes.
+            self.x += cos_latitude * math.cos(longitude)
+            self.y += math.sin(latitude)
+            self.z += cos_latitude * math.sin(longitude)
 
-        Returns:
-            tuple[float, float]: the coordinates of the calculated central point.
+
+    def accumulate(self, latitudes : numpy.ndarray, longitudes : numpy.ndarray) -> None :
         """
+        This method adds the cartesian coordinates of a batch of locations to the running
+        sums, the trigonometry is vectorized over the whole batch at once.
 
-        x = 0
-        y = 0
-        z = 0
+        Parameters:
+            latitudes (numpy.ndarray): the latitudes of the locations.
+            longitudes (numpy.ndarray): the longitudes of the locations.
+        """
 
-        if len(self.coordinates) > 0 :
+        latitudes = numpy.radians(latitudes)
+        longitudes = numpy.radians(longitudes)
 
-            # Find the average (x, y, z) self.coordinates converted from latitude and longitude
-            for i in self.coordinates :
+        cos_latitudes = numpy.cos(latitudes)
 
-                x += math.cos(i[1] * (math.pi / 180)) * math.cos(i[2] * (math.pi / 180))
-                y += math.sin(i[1] * (math.pi / 180))
-                z += math.cos(i[1] * (math.pi / 180)) * math.sin(i[2] * (math.pi / 180))
+        # Each location is converted from latitude and longitude to (x, y, z)
+        self.x += float(numpy.sum(cos_latitudes * numpy.cos(longitudes)))
+        self.y += float(numpy.sum(numpy.sin(latitudes)))
+        self.z += float(numpy.sum(cos_latitudes * numpy.sin(longitudes)))
 
-            x /= len(self.coordinates)
-            y /= len(self.coordinates)
-            z /= len(self.coordinates)
 
-            # The z and x hypotenuse enable you to calculate the latitude and longitude
-            hypotenuse = math.sqrt(z * z + x * x)
-            # atan() can differentiate between values ~(-0,+0)
-            latitude = math.atan(y/hypotenuse) * (180 / math.pi)
-            # The (z/abs(z)) handles the scenario in which acos() cannot correctly 
-            # differentiate between values of ~(-0,+0) and ~(-180,180)
-            longitude = (z/abs(z)) * math.acos(x/hypotenuse) * (180 / math.pi)
+    @property
+    def center(self) -> tuple[float, float] :
+        """
+        This property calculates the center point of all the coordinates in the itinerary
+        from the running sums of their cartesian coordinates.
 
-            self.center = (latitude, longitude)
+        Returns:
+            tuple[float, float]: the coordinates of the calculated central point.
+        """
 
-        else :
+        if len(self.names) == 0 :
 
             # If there are no coordinates the center is set by default to the "center"
             # of the UK.
-            self.center = (53.7547525,-4.8904832)
+            return (53.7547525,-4.8904832)
+
+        # The average (x, y, z) coordinates point in the same direction as the sums, the
+        # z and x hypotenuse enable you to calculate the latitude and longitude. atan2()
+        # differentiates between values of ~(-0,+0) and ~(-180,180).
+        latitude = math.degrees(math.atan2(self.y, math.hypot(self.x, self.z)))
+        longitude = math.degrees(math.atan2(self.z, self.x))
+
+        return (latitude, longitude)
+
+
+    def find_center(self)  -> tuple[float, float]:
+        """
+        This method calculates the center point of all the coordinates in the itinerary,
+        this is for mapping purposes.
+
+        Returns:
+            tuple[float, float]: the coordinates of the calculated central point.
+        """
 
         return self.center
     
@@ -140,7 +343,7 @@ class Itinerary :
             bool: the checksum representing the location's inclusing in the itinerary.
         """
 
-        return (location in self.locations)
+        return (location in self.name_index())
     
 
     # 
@@ -152,18 +355,32 @@ class Itinerary :
             int: the number of coordinates stored in the Itinerary.
         """
 
-        return self.coordinates.__len__()
+        return self.names.__len__()
     
     
     
-    def __iter__(self) -> Iterator:
+    def __iter__(self) -> Iterator[tuple[str, float, float]]:
         """
-        This method retrieves the underlying iterator and allows for simplified
+        This method retrieves an iterator over the locations and allows for simplified
         looping.
 
         Returns:
-            Iterator: The underlying iterator object.
+            Iterator: An iterator of (name, latitude, longitude) tuples.
+        """
+
+        return zip(self.names, self.latitudes, self.longitudes)
+
+
+    def __sizeof__(self) -> int :
+        """
+        This method estimates the memory used by the itinerary's containers, the
+        location names themselves and an index which hasn't been built aren't
+        included.
+
+        Returns:
+            int: the size in bytes.
         """
 
-        return self.coordinates.__iter__()
+        return object.__sizeof__(self) + getsizeof(self.names) + getsizeof(self.latitudes) \
+            + getsizeof(self.longitudes) + (getsizeof(self.locations) if self.locations != None else 0)
         
\ No newline at end of file
@@ -0,0 +1,311 @@
+from time import perf_counter
+import math
+import numpy
+
+from flaskr.model.Itinerary import Itinerary
+
+
+class RouteOptimizer :
+    """
+    This class re-orders the locations of an itinerary to shorten the route between
+    them. The route starts at the first location and visits every other location
+    once, a nearest neighbour route is improved by 2-opt and Or-opt moves until no
+    move shortens it or the time budget runs out.
+    """
+
+
+    # The mean radius of the earth in kilometres
+    EARTH_RADIUS = 6371.0088
+
+    # The smallest improvement which is accepted, avoids cycling on rounding errors
+    EPSILON = 1e-9
+
+
+    def __init__(self, time_budget : float = 0.5, segment_length : int = 3) -> None :
+        """
+        RouteOptimizer object initializer
+
+        Parameters:
+            time_budget (float): the time in seconds the route may be improved for.
+            segment_length (int): the length of the longest segment moved by Or-opt.
+        """
+
+        # Input validation
+        if time_budget < 0 or segment_length <= 0 :
+
+            raise ValueError("Invalid optimizer configuration: time_budget must not be negative and " +\
+                             "segment_length must be positive.")
+
+        self.time_budget : float = time_budget
+        self.segment_length : int = segment_length
+
+
+    def optimize(self, itinerary : Itinerary) -> tuple[Itinerary, float] :
+        """
+        This method finds a short route through the locations of an itinerary.
+
+        Parameters:
+            itinerary (Itinerary): the itinerary to be re-ordered, it isn't modified.
+
+        Returns:
+            tuple[Itinerary, float]: the re-ordered itinerary and the length of its
+            route in kilometres.
+        """
+
+        # Validated input types
+        if not isinstance(itinerary, Itinerary) :
+
+            raise TypeError("Invalid input parameter: itinerary => Itinerary.")
+
+        deadline = perf_counter() + self.time_budget
+
+        matrix = self.distances(itinerary.latitudes, itinerary.longitudes)
+
+        route = self.nearest_neighbour(matrix)
+
+        # The moves index single distances, which is faster on nested lists than arrays
+        distances = matrix.tolist()
+
+        # The moves are alternated until neither improves the route
+        improved = True
+
+        while improved and perf_counter() < deadline :
+
+            improved = self.two_opt(route, distances, deadline)
+            improved = self.or_opt(route, distances, deadline) or improved
+
+        optimized = Itinerary.from_columns([itinerary.names[i] for i in route],
+                                           [itinerary.latitudes[i] for i in route],
+                                           [itinerary.longitudes[i] for i in route])
+
+        return (optimized, self.length(route, distances))
+
+
+    def distances(self, latitudes : list[float], longitudes : list[float]) -> numpy.ndarray :
+        """
+        This method calculates the great-circle distance between every pair of
+        locations by the haversine formula, the whole matrix is calculated at once.
+
+        Parameters:
+            latitudes (list[float]): the latitudes of the locations.
+            longitudes (list[float]): the longitudes of the locations.
+
+        Returns:
+            numpy.ndarray: the matrix of distances in kilometres.
+        """
+
+        latitudes = numpy.radians(numpy.asarray(latitudes, dtype=numpy.float64))
+        longitudes = numpy.radians(numpy.asarray(longitudes, dtype=numpy.float64))
+        cos_latitudes = numpy.cos(latitudes)
+
+        # The haversine of the angle between every pair of locations
+        haversines = numpy.sin((latitudes[None, :] - latitudes[:, None]) / 2) ** 2 + \
+            cos_latitudes[:, None] * cos_latitudes[None, :] * \
+            numpy.sin((longitudes[None, :] - longitudes[:, None]) / 2) ** 2
+
+        return 2 * RouteOptimizer.EARTH_RADIUS * numpy.arcsin(numpy.sqrt(numpy.clip(haversines, 0.0, 1.0)))
+
+
+    def nearest_neighbour(self, distances : numpy.ndarray) -> list[int] :
+        """
+        This method builds a route from the first location by repeatedly visiting the
+        nearest unvisited location.
+
+        Parameters:
+            distances (numpy.ndarray): the matrix of distances.
+
+        Returns:
+            list[int]: the indices of the locations in route order.
+        """
+
+        count = len(distances)
+
+        if count == 0 :
+
+            return []
+
+        route = [0]
+
+        # The distance to each location, visited locations are never nearest
+        visited = numpy.zeros(count, dtype=bool)
+        visited[0] = True
+
+        for _ in range(count - 1) :
+
+            row = numpy.where(visited, numpy.inf, distances[route[-1]])
+            nearest = int(numpy.argmin(row))
+
+            visited[nearest] = True
+            route.append(nearest)
+
+        return route
+
+
+    def two_opt(self, route : list[int], distances : list[list[float]], deadline : float) -> bool :
+        """
+        This method shortens the route by reversing sections of it in place, the first
+        location always remains the start of the route.
+
+        Parameters:
+            route (list[int]): the route to be improved.
+            distances (list[list[float]]): the matrix of distances.
+            deadline (float): the perf_counter time at which the improvement stops.
+
+        Returns:
+            bool: True if the route was shortened.
+        """
+
+        improved = False
+        count = len(route)
+
+        for i in range(1, count - 1) :
+
+            if perf_counter() >= deadline :
+
+                break
+
+            a = route[i - 1]
+            b = route[i]
+            row_a = distances[a]
+            row_b = distances[b]
+            removed = row_a[b]
+
+            for k in range(i + 1, count) :
+
+                c = route[k]
+
+                # The section between b and c is reversed, the route has no edge after
+                # its final location.
+                if k + 1 < count :
+
+                    e = route[k + 1]
+                    delta = row_a[c] + row_b[e] - removed - distances[c][e]
+
+                else :
+
+                    delta = row_a[c] - removed
+
+                if delta < -RouteOptimizer.EPSILON :
+
+                    route[i:k + 1] = route[k:i - 1:-1]
+
+                    improved = True
+                    b = route[i]
+                    row_b = distances[b]
+                    removed = row_a[b]
+
+        return improved
+
+
+    def or_opt(self, route : list[int], distances : list[list[float]], deadline : float) -> bool :
+        """
+        This method shortens the route by moving short segments of it, possibly
+        reversed, to a better position in place.
+
+        Parameters:
+            route (list[int]): the route to be improved.
+            distances (list[list[float]]): the matrix of distances.
+            deadline (float): the perf_counter time at which the improvement stops.
+
+        Returns:
+            bool: True if the route was shortened.
+        """
+
+        improved = False
+
+        for length in range(1, self.segment_length + 1) :
+
+            i = 1
+
+            while i + length <= len(route) :
+
+                if perf_counter() >= deadline :
+
+                    return improved
+
+                count = len(route)
+                first = route[i]
+                last = route[i + length - 1]
+                before = route[i - 1]
+                after = route[i + length] if i + length < count else None
+
+                # The distance saved by removing the segment from the route
+                if after != None :
+
+                    gain = distances[before][first] + distances[last][after] - distances[before][after]
+
+                else :
+
+                    gain = distances[before][first]
+
+                best = None
+                best_cost = gain - RouteOptimizer.EPSILON
+
+                row_first = distances[first]
+                row_last = distances[last]
+
+                # The segment may be inserted after any location outside of it
+                for j in range(count) :
+
+                    if i - 1 <= j < i + length :
+
+                        continue
+
+                    p = route[j]
+                    q = route[j + 1] if j + 1 < count else None
+
+                    if q != None :
+
+                        removed = distances[p][q]
+                        forward = row_first[p] + row_last[q] - removed
+                        backward = row_last[p] + row_first[q] - removed
+
+                    else :
+
+                        forward = row_first[p]
+                        backward = row_last[p]
+
+                    if forward < best_cost :
+
+                        best = (j, False)
+                        best_cost = forward
+
+                    if backward < best_cost :
+
+                        best = (j, True)
+                        best_cost = backward
+
+                if best == None :
+
+                    i += 1
+                    continue
+
+                # The segment is moved, the insertion index shifts once it is removed
+                segment = route[i:i + length]
+                del route[i:i + length]
+
+                if best[1] :
+
+                    segment.reverse()
+
+                j = best[0] if best[0] < i else best[0] - length
+                route[j + 1:j + 1] = segment
+
+                improved = True
+
+        return improved
+
+
+    def length(self, route : list[int], distances : list[list[float]]) -> float :
+        """
+        This method calculates the length of a route.
+
+        Parameters:
+            route (list[int]): the indices of the locations in route order.
+            distances (list[list[float]]): the matrix of distances.
+
+        Returns:
+            float: the length of the route in kilometres.
+        """
+
+        return math.fsum(distances[a][b] for a, b in zip(route, route[1:]))
@@ -10,7 +10,7 @@ class Weather :
     def __init__(self, lat : float, lng : float, current_temp : float | None,\
                  min_temp : float | None, max_temp : float | None, feels_like : float | None,\
                  humidity : float | None, description : str | None,wind_speed : float | None,\
-                 rain : float | None, visibility : int | None) -> None :
+                 rain : float | None, visibility : int | None, age : int = 0) -> None :
         """
         Weather object initializer.
 
@@ -26,6 +26,7 @@ class Weather :
             wind_speed (float | None): the windspeed
             rain (float | None): the volume of rain in mm.
             visibility (int | None): visibility distance in meters with a maximum of 10000.
+            age (int): the number of seconds since the data was retrieved, 0 by default.
         """
 
         self.coordinates : list[float, float] = [lat, lng]
@@ -40,6 +41,7 @@ class Weather :
             "rain" : rain,
             "visibility" : visibility
         }
+        self.age : int = age
 
 
 
@@ -0,0 +1,294 @@
+import aiohttp
+import asyncio
+from threading import Thread, Lock
+from time import monotonic
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit
+
+from flaskr.model.exceptions.CircuitOpenException import CircuitOpenException
+from flaskr.model.data_access_layer.HTTPClient import HTTPClient
+
+
+class AsyncFanOut :
+    """
+    This class provides an asyncio event loop, running on a background thread, on
+    which large numbers of upstream requests can be run concurrently without holding
+    a thread per request. Concurrency is capped by a semaphore shared by every
+    request and each fan-out is bounded by an overall deadline. Requests follow the
+    timeouts, retries and circuit breaker of the shared HTTP client.
+    """
+
+
+    def __init__(self, max_concurrency : int = 100, deadline : float = 10, http : HTTPClient | None = None) -> None :
+        """
+        AsyncFanOut object initializer
+
+        Parameters:
+            max_concurrency (int): the maximum number of upstream requests in flight.
+            deadline (float): the default number of seconds a fan-out may take.
+            http (HTTPClient | None): the HTTP client whose timeouts, retries and
+            circuit breaker are followed, a new client is created if None.
+        """
+
+        # Input validation
+        if max_concurrency <= 0 or deadline <= 0 :
+
+            raise ValueError("Invalid fan-out configuration: max_concurrency and deadline" +\
+                             " must be positive.")
+
+        self.max_concurrency : int = max_concurrency
+        self.deadline : float = deadline
+        self.http : HTTPClient = http if http != None else HTTPClient()
+
+        self.session : aiohttp.ClientSession | None = None
+        self.semaphore : asyncio.Semaphore | None = None
+
+        # The event loop is started on a daemon thread for the lifetime of the app
+        self.loop : asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.thread : Thread | None = None
+        self.lock : Lock = Lock()
+
+
+    def start(self) -> None :
+        """
+        This method starts the event loop thread if it isn't already running.
+        """
+
+        with self.lock :
+
+            if self.thread == None :
+
+                self.thread = Thread(target=self.loop.run_forever, name="async-fan-out", daemon=True)
+                self.thread.start()
+
+
+    async def open(self) -> aiohttp.ClientSession :
+        """
+        This coroutine retrieves the shared client session, the session and semaphore
+        are created on the event loop the first time they are needed.
+
+        Returns:
+            aiohttp.ClientSession: the shared client session.
+        """
+
+        if self.session == None :
+
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+                                                 timeout=aiohttp.ClientTimeout(sock_connect=self.http.connect_timeout,
+                                                                               sock_read=self.http.read_timeout))
+
+        return self.session
+
+
+    def gather(self, calls : list[Callable[[aiohttp.ClientSession], Awaitable[Any]]],\
+               deadline : float | None = None, return_exceptions : bool = False) -> list[Any] :
+        """
+        This method runs every call on the event loop and blocks until they have all
+        completed. The first exception raised by a call is re-raised and
+        TimeoutError is raised if the deadline is exceeded.
+
+        Parameters:
+            calls (list[Callable]): functions which accept the shared client session
+            and return the awaitable to be run.
+            deadline (float | None): the number of seconds the calls may take, by
+            default the fan-out's deadline.
+            return_exceptions (bool): if True the exception raised by a call, or a
+            TimeoutError if it didn't complete by the deadline, is returned in place
+            of its result rather than failing every call.
+
+        Returns:
+            list[Any]: the results of each call in order.
+        """
+
+        if deadline == None :
+
+            deadline = self.deadline
+
+        self.start()
+
+        future = asyncio.run_coroutine_threadsafe(self.run(calls, deadline, return_exceptions), self.loop)
+
+        return future.result()
+
+
+    async def run(self, calls : list[Callable[[aiohttp.ClientSession], Awaitable[Any]]],\
+                  deadline : float, return_exceptions : bool = False) -> list[Any] :
+        """
+        This coroutine runs every call concurrently under the shared semaphore.
+
+        Parameters:
+            calls (list[Callable]): functions which accept the shared client session
+            and return the awaitable to be run.
+            deadline (float): the number of seconds the calls may take.
+            return_exceptions (bool): if True exceptions are returned in place of the
+            results of the calls which failed or didn't complete.
+
+        Returns:
+            list[Any]: the results of each call in order.
+        """
+
+        session = await self.open()
+
+        async def limited(call : Callable[[aiohttp.ClientSession], Awaitable[Any]]) -> Any :
+
+            async with self.semaphore :
+
+                return await call(session)
+
+        # Outstanding calls are cancelled when the deadline passes or a call fails
+        tasks = [asyncio.ensure_future(limited(call)) for call in calls]
+
+        try :
+
+            if not return_exceptions :
+
+                return await asyncio.wait_for(asyncio.gather(*tasks), deadline)
+
+            if len(tasks) > 0 :
+
+                await asyncio.wait(tasks, timeout=deadline)
+
+            # Calls still running at the deadline are reported as timed out
+            results = []
+
+            for task in tasks :
+
+                if not task.done() :
+
+                    results.append(TimeoutError())
+
+                elif task.exception() != None :
+
+                    results.append(task.exception())
+
+                else :
+
+                    results.append(task.result())
+
+            return results
+
+        finally :
+
+            for task in tasks :
+
+                task.cancel()
+
+
+    async def get_json(self, session : aiohttp.ClientSession, url : str, params : dict) -> tuple[int, Any] :
+        """
+        This coroutine sends a HTTP GET request and decodes its json response.
+        Connection errors, timeouts and transient statuses are retried until the
+        HTTP client's retries run out, the fan-out's deadline bounds the whole request.
+
+        Parameters:
+            session (aiohttp.ClientSession): the shared client session.
+            url (str): the url being requested.
+            params (dict): the url parameters of the request.
+
+        Returns:
+            tuple[int, Any]: the status of the response and its decoded json, or None
+            if the request didn't succeed.
+        """
+
+        host = urlsplit(url).netloc
+        end = monotonic() + self.deadline
+        attempt = 0
+
+        while True :
+
+            # Hosts which keep failing are refused without a request or using their quota
+            if not self.http.breaker.allow(host) :
+
+                raise CircuitOpenException(host)
+
+            # The request waits for the host's quota within the deadline, a limiter shared
+            # through SQLite blocks so it is consulted off the event loop.
+            if self.http.limiter != None :
+
+                try :
+
+                    if self.http.limiter.file_path != None :
+
+                        delay = await asyncio.get_running_loop().run_in_executor(None, self.http.limiter.acquire,\
+                                                                                 host, max(0.0, end - monotonic()))
+
+                    else :
+
+                        delay = self.http.limiter.acquire(host, max(0.0, end - monotonic()))
+
+                    await asyncio.sleep(delay)
+
+                except BaseException as e :
+
+                    self.http.breaker.release(host)
+
+                    raise
+
+            try :
+
+                async with session.get(url, params=params) as response :
+
+                    # Server errors count towards the circuit, a rate limited host is healthy
+                    if response.status >= 500 :
+
+                        self.http.breaker.failure(host)
+
+                    else :
+
+                        self.http.breaker.success(host)
+
+                    if response.status == 200 :
+
+                        return (response.status, await response.json(content_type=None))
+
+                    status = response.status
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e :
+
+                self.http.breaker.failure(host)
+
+                delay = self.http.delay(attempt, end)
+
+                if delay == None :
+
+                    raise
+
+            except BaseException as e :
+
+                self.http.breaker.release(host)
+
+                raise
+
+            else :
+
+                delay = self.http.delay(attempt, end) if status in HTTPClient.TRANSIENT_STATUSES else None
+
+                if delay == None :
+
+                    return (status, None)
+
+            await asyncio.sleep(delay)
+
+            attempt += 1
+
+
+    def close(self) -> None :
+        """
+        This method closes the client session and stops the event loop.
+        """
+
+        with self.lock :
+
+            if self.thread == None :
+
+                return
+
+            if self.session != None :
+
+                asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.thread = None
+            self.session = None
@@ -0,0 +1,166 @@
+from array import array
+from struct import Struct, error
+from sys import byteorder
+
+from flaskr.model.Itinerary import Itinerary
+from flaskr.model.exceptions.ItineraryRequestException import ItineraryRequestException
+from flaskr.model.exceptions.InvalidItineraryException import InvalidItineraryException
+
+
+class BinaryItineraryFormat :
+    """
+    This class encodes and decodes the versioned binary itinerary save format. A
+    save begins with a fixed size header holding the number of locations, the
+    center and the bounding box of the itinerary, followed by the latitudes and
+    longitudes as packed little-endian float64 columns and a string table of the
+    location names. The header can be read without parsing the rest of the save.
+    """
+
+
+    # The first bytes of every binary save
+    MAGIC = b"ITIN"
+
+    # The current version of the format
+    VERSION = 1
+
+    # The header: magic, version, flags, count, reserved, center and bounding box
+    HEADER = Struct("<4sHHII6d")
+
+
+    @staticmethod
+    def encode(itinerary : Itinerary) -> bytes :
+        """
+        This method encodes an itinerary in the binary save format.
+
+        Parameters:
+            itinerary (Itinerary): the itinerary to be encoded.
+
+        Returns:
+            bytes: the encoded itinerary.
+        """
+
+        latitudes = array("d")
+        longitudes = array("d")
+        offsets = array("I", [0])
+        names = bytearray()
+
+        # The locations are split into columns
+        for location in itinerary :
+
+            latitudes.append(location[1])
+            longitudes.append(location[2])
+
+            names += location[0].encode("utf-8")
+            offsets.append(len(names))
+
+        center = itinerary.find_center()
+
+        # An empty itinerary has an empty bounding box
+        bounds = (0.0, 0.0, 0.0, 0.0)
+
+        if len(latitudes) > 0 :
+
+            bounds = (min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+
+        # The columns are stored in little-endian byte order
+        if byteorder == "big" :
+
+            latitudes.byteswap()
+            longitudes.byteswap()
+            offsets.byteswap()
+
+        header = BinaryItineraryFormat.HEADER.pack(BinaryItineraryFormat.MAGIC, BinaryItineraryFormat.VERSION,
+                                                   0, len(latitudes), 0, center[0], center[1], *bounds)
+
+        return b"".join([header, latitudes.tobytes(), longitudes.tobytes(), offsets.tobytes(), names])
+
+
+    @staticmethod
+    def read_header(buffer : bytes | memoryview) -> tuple[int, tuple[float, float], tuple[float, float, float, float]] :
+        """
+        This method decodes the header of a binary save.
+
+        Parameters:
+            buffer (bytes | memoryview): the save, or at least its header.
+
+        Returns:
+            tuple: the number of locations, the center and the bounding box
+            (min latitude, min longitude, max latitude, max longitude).
+        """
+
+        try :
+
+            header = BinaryItineraryFormat.HEADER.unpack_from(buffer)
+
+        except error as e :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+        # The save is validated
+        if header[0] != BinaryItineraryFormat.MAGIC :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+        if header[1] != BinaryItineraryFormat.VERSION :
+
+            raise ItineraryRequestException(f"The stored itinerary uses an unsupported format version {header[1]}")
+
+        return (header[3], (header[5], header[6]), tuple(header[7:11]))
+
+
+    @staticmethod
+    def decode(buffer : bytes | memoryview) -> Itinerary :
+        """
+        This method decodes a binary save into an itinerary.
+
+        Parameters:
+            buffer (bytes | memoryview): the save.
+
+        Returns:
+            Itinerary: the decoded itinerary.
+        """
+
+        count = BinaryItineraryFormat.read_header(buffer)[0]
+
+        # The positions of each column are calculated
+        start = BinaryItineraryFormat.HEADER.size
+        middle = start + 8 * count
+        end = middle + 8 * count
+        names_start = end + 4 * (count + 1)
+
+        if len(buffer) < names_start :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+        latitudes = array("d")
+        longitudes = array("d")
+        offsets = array("I")
+
+        latitudes.frombytes(buffer[start:middle])
+        longitudes.frombytes(buffer[middle:end])
+        offsets.frombytes(buffer[end:names_start])
+
+        if byteorder == "big" :
+
+            latitudes.byteswap()
+            longitudes.byteswap()
+            offsets.byteswap()
+
+        names = bytes(buffer[names_start:])
+
+        if offsets[-1] != len(names) :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+        # The columns are re-assembled into an itinerary as a single batch
+        try :
+
+            locations = [names[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+
+            itinerary = Itinerary.from_columns(locations, latitudes, longitudes)
+
+        except (UnicodeDecodeError, InvalidItineraryException) as e :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+        return itinerary
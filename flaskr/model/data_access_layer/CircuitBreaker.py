@@ -0,0 +1,121 @@
+from threading import Lock
+from time import monotonic
+
+
+class CircuitBreaker :
+    """
+    This class tracks the failures of each upstream host. Once a host fails
+    repeatedly its circuit opens and requests to it are refused immediately, after
+    a cool-down a single trial request is allowed through and the circuit closes
+    again if it succeeds.
+    """
+
+
+    def __init__(self, failure_threshold : int = 5, reset_timeout : float = 30) -> None :
+        """
+        CircuitBreaker object initializer
+
+        Parameters:
+            failure_threshold (int): the number of consecutive failures which open the
+            circuit of a host.
+            reset_timeout (float): the number of seconds a circuit stays open before a
+            trial request is allowed.
+        """
+
+        # Input validation
+        if failure_threshold <= 0 or reset_timeout <= 0 :
+
+            raise ValueError("Invalid breaker configuration: failure_threshold and reset_timeout" +\
+                             " must be positive.")
+
+        self.failure_threshold : int = failure_threshold
+        self.reset_timeout : float = reset_timeout
+
+        # The consecutive failures, the time the circuit opened and whether a trial
+        # request is in flight for each host.
+        self.hosts : dict[str, list] = dict()
+        self.lock : Lock = Lock()
+
+
+    def allow(self, host : str) -> bool :
+        """
+        This method checks whether a request may be sent to a host, every allowed
+        request must be followed by a call to success, failure or release.
+
+        Parameters:
+            host (str): the upstream host.
+
+        Returns:
+            bool: True if the request may be sent.
+        """
+
+        with self.lock :
+
+            state = self.hosts.get(host, None)
+
+            # The circuit is closed
+            if state == None or state[1] == None :
+
+                return True
+
+            # The circuit is open
+            if state[2] or monotonic() - state[1] < self.reset_timeout :
+
+                return False
+
+            # The circuit is half-open, a single trial request is allowed
+            state[2] = True
+
+            return True
+
+
+    def success(self, host : str) -> None :
+        """
+        This method records a successful request, closing the host's circuit.
+
+        Parameters:
+            host (str): the upstream host.
+        """
+
+        with self.lock :
+
+            self.hosts.pop(host, None)
+
+
+    def failure(self, host : str) -> None :
+        """
+        This method records a failed request, the host's circuit opens once the
+        failure threshold is reached or if a trial request fails.
+
+        Parameters:
+            host (str): the upstream host.
+        """
+
+        with self.lock :
+
+            state = self.hosts.setdefault(host, [0, None, False])
+            state[0] += 1
+
+            if state[2] or state[0] >= self.failure_threshold :
+
+                state[1] = monotonic()
+                state[2] = False
+
+
+    def release(self, host : str) -> None :
+        """
+        This method records a request which was abandoned without an outcome, such
+        as a cancelled request, so a further trial request may be allowed.
+
+        Parameters:
+            host (str): the upstream host.
+        """
+
+        with self.lock :
+
+            state = self.hosts.get(host, None)
+
+            if state != None :
+
+                state[2] = False
+
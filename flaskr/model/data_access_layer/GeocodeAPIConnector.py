@@ -1,6 +1,15 @@
+import aiohttp
+import asyncio
 import requests
 
 from flaskr.model.exceptions.GeocodeRequestException import GeocodeRequestException
+from flaskr.model.exceptions.CircuitOpenException import CircuitOpenException
+from flaskr.model.exceptions.RateLimitException import RateLimitException
+from flaskr.model.data_access_layer.AsyncFanOut import AsyncFanOut
+from flaskr.model.data_access_layer.GeocodeCache import GeocodeCache
+from flaskr.model.data_access_layer.HTTPClient import HTTPClient
+from flaskr.model.data_access_layer.SingleFlight import SingleFlight
+from flaskr.model.data_access_layer.WorkerPool import WorkerPool
 
 
 class GeocodeApiConnector :
@@ -14,16 +23,29 @@ class GeocodeApiConnector :
     URL_GEOCODE = "https://maps.googleapis.com/maps/api/geocode/json"
 
     
-    def __init__(self, api_key : str) -> None :
+    def __init__(self, api_key : str, http : HTTPClient | None = None,\
+                 fan_out : AsyncFanOut | None = None, cache : GeocodeCache | None = None,\
+                 pool : WorkerPool | None = None) -> None :
         
         """
         GeocodeApiConnector object initializer
 
         Parameters:
             api_key (str): a google cloud api key.
+            http (HTTPClient | None): an optional HTTP client shared between connectors.
+            fan_out (AsyncFanOut | None): an optional event loop shared between requests.
+            cache (GeocodeCache | None): an optional persistent cache of results.
+            pool (WorkerPool | None): an optional pool of worker threads shared between
+            requests.
         """
 
+        self.api_key : str = api_key
         self.url_geocode : str = self.URL_GEOCODE + f"?key={api_key}"   
+        self.fan_out : AsyncFanOut | None = fan_out
+        self.cache : GeocodeCache | None = cache
+        self.pool : WorkerPool | None = pool
+        self.single_flight : SingleFlight = SingleFlight()
+        self.http : HTTPClient = http if http != None else HTTPClient()
 
 
     def request_coordinates(self, location : str) -> tuple[float, float] :
@@ -44,10 +66,44 @@ class GeocodeApiConnector :
 
             raise TypeError("Invalid input parameters: location => str and lang => str.")
 
-        # The request is sent
-        response = requests.get(self.url_geocode, params = {
-            "address" : location
-        })
+        # Cached coordinates are returned if they are still valid
+        if self.cache != None :
+
+            coordinates = self.cache.get(location)
+
+            if coordinates != None :
+
+                return coordinates
+
+        # Concurrent identical requests are coalesced into a single upstream request
+        return self.single_flight.do(self.flight_key(location), self.request_geocode, location)
+
+
+    def request_geocode(self, location : str) -> tuple[float, float] :
+
+        """
+        This method sends a geocode request to the Google Geocode API and caches the
+        result, the input parameters are expected to have been validated.
+
+        Parameters:
+            location (str): the plain text description address or name of a certain 
+            location.
+
+        Returns:
+            tuple: the latitude and longitude of the location.
+        """
+
+        # The request is sent, network failures, unavailable hosts and exhausted quotas
+        # are reported as failed requests
+        try :
+
+            response = self.http.get(self.url_geocode, params = {
+                "address" : location
+            })
+
+        except (requests.exceptions.RequestException, CircuitOpenException, RateLimitException) as e :
+
+            raise GeocodeRequestException()
 
         json_data : dict | None = None
 
@@ -67,36 +123,239 @@ class GeocodeApiConnector :
             raise GeocodeRequestException()
         
         
-        coordinates = ()
+        coordinates = self.parse_coordinates(json_data)
 
-        # Results validation
-        if json_data["results"] != [] :
+        # The coordinates are cached for subsequent requests
+        if self.cache != None :
 
-            location = json_data["results"][0]["geometry"]["location"]
+            self.cache.put(location, coordinates)
 
-            coordinates = (location["lat"], location["lng"])
+        return coordinates
+
+
+
+    def bulk_coordinates(self, locations : list[str], limit : int | None = None) \
+        -> dict[str, tuple[float, float] | GeocodeRequestException] :
+
+        """
+        This method retrieves the coordinates corresponding to a list of location names.
+        Repeated names are requested once and the requests are run on a pool of worker
+        threads, a failed request doesn't affect the others.
+
+        Parameters:
+            locations (list[str]): the plain text descriptions, addresses or names of
+            the locations.
+            limit (int | None): the maximum number of concurrent requests, by default
+            the worker pool's limit.
+
+        Returns:
+            dict: the latitude and longitude, or the exception raised, of each distinct
+            location in the order first requested.
+        """
+
+        # Input validation
+        if (not isinstance(locations, list)) or any(not isinstance(i, str) for i in locations) :
+
+            raise TypeError("Invalid input parameters: locations => list[str].")
+
+        # Repeated names are removed
+        locations = list(dict.fromkeys(locations))
+
+        # The requests are fanned out over the worker pool, a temporary pool is used
+        # when none is shared.
+        pool = self.pool if self.pool != None else WorkerPool()
+
+        results = dict()
+
+        try :
+
+            for location, future in zip(locations, pool.imap(self.request_coordinates,
+                                                             [(location,) for location in locations], limit)) :
+
+                exception = future.exception()
+
+                # Unexpected exceptions are reported as failed requests
+                if exception == None :
+
+                    results[location] = future.result()
+
+                elif isinstance(exception, GeocodeRequestException) :
+
+                    results[location] = exception
+
+                else :
+
+                    results[location] = GeocodeRequestException()
+
+        finally :
+
+            if pool != self.pool :
+
+                pool.shutdown()
+
+        return results
+
+
+    def fan_out_coordinates(self, locations : list[str], deadline : float | None = None) \
+        -> dict[str, tuple[float, float] | GeocodeRequestException] :
+
+        """
+        This method retrieves the coordinates corresponding to a list of location names.
+        This method runs every request concurrently on the shared asyncio event loop,
+        repeated names are requested once and a failed request doesn't affect the others.
+
+        Parameters:
+            locations (list[str]): the plain text descriptions, addresses or names of
+            the locations.
+            deadline (float | None): the number of seconds the whole request may take,
+            by default the event loop's deadline.
+
+        Returns:
+            dict: the latitude and longitude, or the exception raised, of each distinct
+            location in the order first requested.
+        """
+
+        # Input validation
+        if (not isinstance(locations, list)) or any(not isinstance(i, str) for i in locations) :
+
+            raise TypeError("Invalid input parameters: locations => list[str].")
+
+        # Fall back to the worker pool when no event loop is shared
+        if self.fan_out == None :
+
+            return self.bulk_coordinates(locations)
+
+        # Repeated names are removed
+        locations = list(dict.fromkeys(locations))
+
+        calls = [lambda session, location=location : self.request_coordinates_async(session, location) \
+                 for location in locations]
+
+        # Requests which failed or didn't complete by the deadline are reported as
+        # failed requests
+        return {location : result if isinstance(result, (tuple, GeocodeRequestException)) \
+                else GeocodeRequestException() \
+                for location, result in zip(locations, self.fan_out.gather(calls, deadline, return_exceptions=True))}
+
+
+    async def request_coordinates_async(self, session : aiohttp.ClientSession, location : str) -> tuple[float, float] :
+
+        """
+        This coroutine is the asynchronous counterpart of request_coordinates, the input
+        parameters are expected to have been validated.
+
+        Parameters:
+            session (aiohttp.ClientSession): the client session used to send the request.
+            location (str): the plain text description address or name of a certain 
+            location.
+
+        Returns:
+            tuple: the latitude and longitude of the location.
+        """
+
+        # Cached coordinates are returned if they are still valid
+        if self.cache != None :
+
+            coordinates = self.cache.get(location)
+
+            if coordinates != None :
+
+                return coordinates
+
+        # Concurrent identical requests are coalesced into a single upstream request
+        return await self.single_flight.do_async(self.flight_key(location), self.request_geocode_async,\
+                                                 session, location)
+
+
+    async def request_geocode_async(self, session : aiohttp.ClientSession, location : str) -> tuple[float, float] :
+
+        """
+        This coroutine is the asynchronous counterpart of request_geocode.
+
+        Parameters:
+            session (aiohttp.ClientSession): the client session used to send the request.
+            location (str): the plain text description address or name of a certain 
+            location.
+
+        Returns:
+            tuple: the latitude and longitude of the location.
+        """
+
+        # The request is sent, network failures, unavailable hosts and exhausted quotas
+        # are reported as failed requests
+        try :
+
+            status, json_data = await self.fan_out.get_json(session, self.URL_GEOCODE, params = {
+                "key" : self.api_key,
+                "address" : location
+            })
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, CircuitOpenException, RateLimitException) as e :
+
+            raise GeocodeRequestException()
+
+        # The api response is validated
+        if status != requests.codes.ok :
+
+            raise GeocodeRequestException()
+
+        coordinates = self.parse_coordinates(json_data)
+
+        # The coordinates are cached for subsequent requests
+        if self.cache != None :
+
+            self.cache.put(location, coordinates)
 
         return coordinates
 
 
-        
-        
+    def flight_key(self, location : str) -> str :
 
-                
+        """
+        This method generates the key used to coalesce identical requests, requests
+        which share a cache entry are considered identical.
 
-            
+        Parameters:
+            location (str): the plain text location name.
 
+        Returns:
+            str: the request key.
+        """
 
+        if self.cache != None :
 
+            return self.cache.key(location)
 
+        return location
 
-        
-        
 
+    def parse_coordinates(self, json_data : dict) -> tuple[float, float] :
 
+        """
+        This method retrieves the coordinates of the first result of a geocode api
+        response. Google reports exhausted quotas and rejected requests with an
+        empty list of results, so only a status of "OK" or "ZERO_RESULTS" is valid.
 
+        Parameters:
+            json_data (dict): the decoded json response.
 
-        
+        Returns:
+            tuple: the latitude and longitude of the location or an empty tuple if
+            there were no results.
+        """
 
-        
-        
+        # The response status is validated
+        if not isinstance(json_data, dict) or json_data.get("status", None) not in {"OK", "ZERO_RESULTS"} :
+
+            raise GeocodeRequestException()
+
+        coordinates = ()
+
+        # Results validation
+        if json_data["status"] == "OK" and json_data.get("results", []) != [] :
+
+            location = json_data["results"][0]["geometry"]["location"]
+
+            coordinates = (location["lat"], location["lng"])
+
+        return coordinates
@@ -0,0 +1,210 @@
+import re
+import sqlite3
+import unicodedata
+from os import makedirs
+from os.path import dirname
+from threading import Lock, local
+from time import time
+
+
+class GeocodeCache :
+    """
+    This class provides a persistent, SQLite backed cache of geocoding results.
+    Location names are normalized so that trivially different spellings of a name
+    share a single entry, and entries expire after a configurable period. Locations
+    without results expire sooner, since they may be found later, and expired
+    entries are deleted after every purge_interval writes. The cache is bypassed
+    rather than failing a request when the database can't be used.
+    """
+
+
+    # This pattern matches the characters removed from location names
+    PUNCTUATION = re.compile(r"[^\w\s]")
+
+    # This pattern matches runs of whitespace
+    WHITESPACE = re.compile(r"\s+")
+
+
+    def __init__(self, file_path : str, ttl : float = 30 * 24 * 60 * 60, empty_ttl : float = 60 * 60,\
+                 purge_interval : int = 1000) -> None :
+        """
+        GeocodeCache object initializer
+
+        Parameters:
+            file_path (str): the path to the SQLite database file.
+            ttl (float): the number of seconds an entry remains valid, 30 days by
+            default.
+            empty_ttl (float): the number of seconds an entry of a location without
+            results remains valid, 1 hour by default.
+            purge_interval (int): the number of writes after which the expired entries
+            are deleted.
+        """
+
+        # Input validation
+        if ttl <= 0 or empty_ttl <= 0 or purge_interval <= 0 :
+
+            raise ValueError("Invalid cache configuration: ttl, empty_ttl and purge_interval must be positive.")
+
+        self.file_path : str = file_path
+        self.ttl : float = ttl
+        self.empty_ttl : float = min(ttl, empty_ttl)
+        self.purge_interval : int = purge_interval
+
+        # The number of writes since the expired entries were last deleted
+        self.writes : int = 0
+        self.lock : Lock = Lock()
+
+        # SQLite connections cannot be shared between threads
+        self.connections : local = local()
+
+        # The database and its table are created if they don't already exist
+        if dirname(file_path) != "" :
+
+            makedirs(dirname(file_path), exist_ok=True)
+
+        with self.connection() as connection :
+
+            connection.execute("CREATE TABLE IF NOT EXISTS geocode (" +\
+                               "key TEXT PRIMARY KEY, " +\
+                               "latitude REAL, " +\
+                               "longitude REAL, " +\
+                               "created REAL NOT NULL) WITHOUT ROWID")
+
+
+    def connection(self) -> sqlite3.Connection :
+        """
+        This method retrieves the calling thread's database connection.
+
+        Returns:
+            sqlite3.Connection: the database connection.
+        """
+
+        connection = getattr(self.connections, "connection", None)
+
+        if connection == None :
+
+            connection = sqlite3.connect(self.file_path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+            self.connections.connection = connection
+
+        return connection
+
+
+    def key(self, location : str) -> str :
+        """
+        This method normalizes a location name: case, punctuation and whitespace are
+        ignored.
+
+        Parameters:
+            location (str): the plain text location name.
+
+        Returns:
+            str: the normalized location name.
+        """
+
+        location = unicodedata.normalize("NFKC", location).casefold()
+        location = self.PUNCTUATION.sub(" ", location)
+
+        return self.WHITESPACE.sub(" ", location).strip()
+
+
+    def get(self, location : str) -> tuple[float, float] | tuple[()] | None :
+        """
+        This method retrieves cached coordinates if a valid entry exists.
+
+        Parameters:
+            location (str): the plain text location name.
+
+        Returns:
+            tuple[float, float] | tuple[()] | None: the coordinates of the location, an
+            empty tuple if the location has no coordinates or None if no valid entry
+            exists.
+        """
+
+        now = time()
+
+        # A database which can't be read is treated as a cache miss
+        try :
+
+            row = self.connection().execute("SELECT latitude, longitude, created FROM geocode " +\
+                                            "WHERE key = ? AND created > ?",
+                                            (self.key(location), now - self.ttl)).fetchone()
+
+        except sqlite3.Error as e :
+
+            return None
+
+        if row == None :
+
+            return None
+
+        # Locations without results are cached as an empty tuple
+        if row[0] == None or row[1] == None :
+
+            return () if row[2] > now - self.empty_ttl else None
+
+        return (row[0], row[1])
+
+
+    def put(self, location : str, coordinates : tuple[float, float] | tuple[()]) -> None :
+        """
+        This method stores the coordinates of a location in the cache.
+
+        Parameters:
+            location (str): the plain text location name.
+            coordinates (tuple[float, float] | tuple[()]): the coordinates of the
+            location or an empty tuple if the location has no coordinates.
+        """
+
+        latitude, longitude = coordinates if len(coordinates) == 2 else (None, None)
+
+        # A database which can't be written to is bypassed, the entry isn't cached
+        try :
+
+            with self.connection() as connection :
+
+                connection.execute("INSERT OR REPLACE INTO geocode (key, latitude, longitude, created) " +\
+                                   "VALUES (?, ?, ?, ?)", (self.key(location), latitude, longitude, time()))
+
+        except sqlite3.Error as e :
+
+            return
+
+        # The expired entries are deleted periodically so the database doesn't grow forever
+        with self.lock :
+
+            self.writes += 1
+            purge = self.writes >= self.purge_interval
+
+            if purge :
+
+                self.writes = 0
+
+        if purge :
+
+            try :
+
+                self.purge()
+
+            except sqlite3.Error as e :
+
+                pass
+
+
+    def purge(self) -> int :
+        """
+        This method deletes every expired entry from the cache.
+
+        Returns:
+            int: the number of entries deleted.
+        """
+
+        with self.connection() as connection :
+
+            cursor = connection.execute("DELETE FROM geocode WHERE created <= ? " +\
+                                        "OR (latitude IS NULL AND created <= ?)",
+                                        (time() - self.ttl, time() - self.empty_ttl))
+
+        return cursor.rowcount
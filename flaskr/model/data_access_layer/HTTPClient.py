@@ -0,0 +1,253 @@
+import requests
+from random import uniform
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from time import monotonic, sleep
+from urllib.parse import urlsplit
+
+from flaskr.model.exceptions.CircuitOpenException import CircuitOpenException
+from flaskr.model.data_access_layer.CircuitBreaker import CircuitBreaker
+from flaskr.model.data_access_layer.RateLimiter import RateLimiter
+
+
+class HTTPClient :
+    """
+    This class provides long-lived, keep-alive HTTP sessions shared by the upstream
+    API connectors. A separate connection pool is kept for each upstream host so
+    connections are reused rather than re-negotiated on every request. Every request
+    is bounded by timeouts and a deadline, transient failures are retried after a
+    jittered backoff and hosts which keep failing are refused by a circuit breaker.
+    Requests may also be paced to each host's quota by a rate limiter.
+    """
+
+
+    # The response statuses which are retried
+    TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+
+    def __init__(self, pool_size : int = 32, breaker : CircuitBreaker | None = None,\
+                 connect_timeout : float = 3.05, read_timeout : float = 10, deadline : float = 15,\
+                 retries : int = 2, backoff : float = 0.25, max_backoff : float = 2,\
+                 limiter : RateLimiter | None = None) -> None :
+        """
+        HTTPClient object initializer
+
+        Parameters:
+            pool_size (int): the maximum number of connections kept open per host.
+            breaker (CircuitBreaker | None): the circuit breaker of the upstream hosts,
+            a new breaker is created if None.
+            connect_timeout (float): the number of seconds a connection may take.
+            read_timeout (float): the number of seconds the server may take to respond.
+            deadline (float): the number of seconds a request may take including retries.
+            retries (int): the maximum number of times a request is retried.
+            backoff (float): the base number of seconds waited before a retry, doubled
+            on each attempt.
+            max_backoff (float): the maximum number of seconds waited before a retry.
+            limiter (RateLimiter | None): an optional rate limiter of the upstream hosts.
+        """
+
+        # Input validation
+        if pool_size <= 0 or connect_timeout <= 0 or read_timeout <= 0 or deadline <= 0 \
+            or retries < 0 or backoff < 0 or max_backoff < 0 :
+
+            raise ValueError("Invalid client configuration: pool_size, the timeouts and deadline must be" +\
+                             " positive and retries and the backoff must not be negative.")
+
+        self.pool_size : int = pool_size
+        self.breaker : CircuitBreaker = breaker if breaker != None else CircuitBreaker()
+        self.connect_timeout : float = connect_timeout
+        self.read_timeout : float = read_timeout
+        self.deadline : float = deadline
+        self.retries : int = retries
+        self.backoff : float = backoff
+        self.max_backoff : float = max_backoff
+        self.limiter : RateLimiter | None = limiter
+
+        self.sessions : dict[str, requests.Session] = dict()
+        self.lock : Lock = Lock()
+
+
+    def session(self, url : str) -> requests.Session :
+        """
+        This method retrieves the session corresponding to the host of a url, the
+        session is created the first time a host is requested.
+
+        Parameters:
+            url (str): the url being requested.
+
+        Returns:
+            requests.Session: the session for the url's host.
+        """
+
+        host = urlsplit(url).netloc
+
+        with self.lock :
+
+            session = self.sessions.get(host, None)
+
+            if session == None :
+
+                # The adapter holds a single pool of up to pool_size connections and
+                # blocks rather than discarding connections when it is exhausted.
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+
+                self.sessions[host] = session
+
+        return session
+
+
+    def get(self, url : str, params : dict | None = None, deadline : float | None = None) -> requests.Response :
+        """
+        This method sends a HTTP GET request using the session for the url's host.
+        Connection errors, timeouts and transient statuses are retried until the
+        retries or the deadline run out.
+
+        Parameters:
+            url (str): the url being requested.
+            params (dict | None): the url parameters of the request.
+            deadline (float | None): the number of seconds the request may take
+            including retries, by default the client's deadline.
+
+        Returns:
+            requests.Response: the response to the request, the last response is
+            returned if a transient status couldn't be retried.
+        """
+
+        host = urlsplit(url).netloc
+        end = monotonic() + (deadline if deadline != None else self.deadline)
+        attempt = 0
+
+        while True :
+
+            # Hosts which keep failing are refused without a request or using their quota
+            if not self.breaker.allow(host) :
+
+                raise CircuitOpenException(host)
+
+            # The request waits for the host's quota within the deadline
+            if self.limiter != None :
+
+                try :
+
+                    sleep(self.limiter.acquire(host, max(0.0, end - monotonic())))
+
+                except BaseException as e :
+
+                    self.breaker.release(host)
+
+                    raise
+
+            remaining = end - monotonic()
+
+            if remaining <= 0 :
+
+                self.breaker.release(host)
+
+                raise requests.exceptions.Timeout(f"The deadline of the request to {host} was exceeded.")
+
+            try :
+
+                response = self.session(url).get(url, params=params,
+                                                 timeout=(min(self.connect_timeout, remaining),
+                                                          min(self.read_timeout, remaining)))
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e :
+
+                self.breaker.failure(host)
+
+                if not self.wait(attempt, end) :
+
+                    raise
+
+            except BaseException as e :
+
+                self.breaker.release(host)
+
+                raise
+
+            else :
+
+                # Server errors count towards the circuit, a rate limited host is healthy
+                if response.status_code >= 500 :
+
+                    self.breaker.failure(host)
+
+                else :
+
+                    self.breaker.success(host)
+
+                if response.status_code not in self.TRANSIENT_STATUSES or not self.wait(attempt, end) :
+
+                    return response
+
+                response.close()
+
+            attempt += 1
+
+
+    def delay(self, attempt : int, end : float) -> float | None :
+        """
+        This method calculates the jittered backoff before a retry.
+
+        Parameters:
+            attempt (int): the number of the attempt which failed, from 0.
+            end (float): the monotonic time by which the request must complete.
+
+        Returns:
+            float | None: the number of seconds to wait or None if the request
+            mustn't be retried.
+        """
+
+        if attempt >= self.retries :
+
+            return None
+
+        # Full jitter spreads out the retries of concurrent requests
+        delay = uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+        if monotonic() + delay >= end :
+
+            return None
+
+        return delay
+
+
+    def wait(self, attempt : int, end : float) -> bool :
+        """
+        This method waits for the jittered backoff before a retry.
+
+        Parameters:
+            attempt (int): the number of the attempt which failed, from 0.
+            end (float): the monotonic time by which the request must complete.
+
+        Returns:
+            bool: True if the request should be retried.
+        """
+
+        delay = self.delay(attempt, end)
+
+        if delay == None :
+
+            return False
+
+        sleep(delay)
+
+        return True
+
+
+    def close(self) -> None :
+        """
+        This method closes every session and its open connections.
+        """
+
+        with self.lock :
+
+            for session in self.sessions.values() :
+
+                session.close()
+
+            self.sessions.clear()
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from sys import getsizeof
+from threading import Lock
+from typing import Hashable
+
+from flaskr.model.Itinerary import Itinerary
+
+
+class ItineraryCache :
+    """
+    This class provides a process-wide, thread-safe, in-memory cache of parsed
+    itineraries. Each entry is stored alongside the version of the save it was
+    parsed from, and the least recently used entries are evicted once the
+    estimated size of the cache exceeds its memory budget.
+    """
+
+
+    def __init__(self, max_bytes : int = 64 * 1024 * 1024) -> None :
+        """
+        ItineraryCache object initializer
+
+        Parameters:
+            max_bytes (int): the memory budget of the cache in bytes, 64MB by default.
+        """
+
+        # Input validation
+        if max_bytes <= 0 :
+
+            raise ValueError("Invalid cache configuration: max_bytes must be positive.")
+
+        self.max_bytes : int = max_bytes
+        self.size : int = 0
+
+        self.entries : OrderedDict[str, tuple[Hashable, Itinerary, int]] = OrderedDict()
+        self.lock : Lock = Lock()
+
+
+    def get(self, key : str, version : Hashable) -> Itinerary | None :
+        """
+        This method retrieves a cached itinerary if it was parsed from the given version
+        of the save.
+
+        Parameters:
+            key (str): the key of the itinerary, e.g. its save file path.
+            version (Hashable): the current version of the save.
+
+        Returns:
+            Itinerary | None: the cached itinerary or None if no valid entry exists.
+        """
+
+        with self.lock :
+
+            entry = self.entries.get(key, None)
+
+            if entry == None :
+
+                return None
+
+            # Outdated entries are discarded
+            if entry[0] != version :
+
+                self.remove(key)
+
+                return None
+
+            self.entries.move_to_end(key)
+
+        return entry[1]
+
+
+    def put(self, key : str, version : Hashable, itinerary : Itinerary) -> None :
+        """
+        This method stores a parsed itinerary in the cache, itineraries larger than the
+        memory budget aren't cached.
+
+        Parameters:
+            key (str): the key of the itinerary, e.g. its save file path.
+            version (Hashable): the version of the save the itinerary was parsed from.
+            itinerary (Itinerary): the parsed itinerary.
+        """
+
+        size = self.estimate(key, itinerary)
+
+        if size > self.max_bytes :
+
+            return
+
+        with self.lock :
+
+            self.remove(key)
+
+            self.entries[key] = (version, itinerary, size)
+            self.size += size
+
+            # The least recently used entries are evicted
+            while self.size > self.max_bytes :
+
+                self.remove(next(iter(self.entries)))
+
+
+    def invalidate(self, key : str) -> None :
+        """
+        This method removes an itinerary from the cache.
+
+        Parameters:
+            key (str): the key of the itinerary, e.g. its save file path.
+        """
+
+        with self.lock :
+
+            self.remove(key)
+
+
+    def remove(self, key : str) -> None :
+        """
+        This method removes an entry and its size from the cache, the caller must hold
+        the lock.
+
+        Parameters:
+            key (str): the key of the itinerary.
+        """
+
+        entry = self.entries.pop(key, None)
+
+        if entry != None :
+
+            self.size -= entry[2]
+
+
+    def estimate(self, key : str, itinerary : Itinerary) -> int :
+        """
+        This method estimates the memory used by a cache entry.
+
+        Parameters:
+            key (str): the key of the itinerary.
+            itinerary (Itinerary): the parsed itinerary.
+
+        Returns:
+            int: the estimated size in bytes.
+        """
+
+        size = getsizeof(key) + getsizeof(itinerary)
+
+        for name in itinerary.names :
+
+            size += getsizeof(name)
+
+        return size
+
+
+    def __len__(self) -> int :
+        """
+        This method returns the number of itineraries in the cache.
+
+        Returns:
+            int: the number of cached itineraries.
+        """
+
+        return self.entries.__len__()
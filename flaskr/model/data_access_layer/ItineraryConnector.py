@@ -1,8 +1,18 @@
 from flaskr.model.Itinerary import Itinerary
 from flaskr.model.exceptions.ItineraryRequestException import ItineraryRequestException
+from flaskr.model.exceptions.InvalidItineraryException import InvalidItineraryException
+from flaskr.model.data_access_layer.ItineraryCache import ItineraryCache
+from flaskr.model.data_access_layer.BinaryItineraryFormat import BinaryItineraryFormat
+from flaskr.model.data_access_layer.SpatialIndex import SpatialIndex
 
-from os.path import exists
-from os import listdir, remove
+from bisect import bisect_left, bisect_right
+from hashlib import sha1
+from mmap import mmap, ACCESS_READ
+from os.path import exists, join
+from os import fsync, listdir, makedirs, remove, replace, scandir, stat
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
 
 
 class ItineraryConnector():
@@ -11,17 +21,59 @@ class ItineraryConnector():
     retrieved, created and destroyed.
     """
 
+
+    # The file extensions of each save format
+    EXTENSIONS = {"csv" : ".save", "binary" : ".itin"}
+
     
-    def __init__(self, dir_path : str) -> None :
+    def __init__(self, dir_path : str, cache : ItineraryCache | None = None, shard_fan_out : int = 0,\
+                 shard_depth : int = 1, rescan_interval : float = 60, save_format : str = "csv",\
+                 index : SpatialIndex | None = None) -> None :
 
         """
         ItineraryConnector object initializer
 
         Parameters:
             dir_path (str): the path to the itinerary saves folder.
+            cache (ItineraryCache | None): an optional cache of parsed itineraries
+            shared between requests.
+            shard_fan_out (int): the number of sub-folders per level of the sharded
+            layout, saves are stored directly in the saves folder if 0.
+            shard_depth (int): the number of levels of sub-folders.
+            rescan_interval (float): the number of seconds between scans for saves
+            added to the sharded layout by other processes.
+            save_format (str): the format saves are written in, either "csv" or
+            "binary". Saves in either format can be read.
+            index (SpatialIndex | None): an optional spatial index of the saved
+            locations, kept up to date as itineraries are saved and deleted.
         """
 
+        # Input validation
+        if shard_fan_out < 0 or shard_fan_out > 0x10000 or shard_depth < 1 or shard_depth > 10 \
+            or rescan_interval <= 0 :
+
+            raise ValueError("Invalid connector configuration: shard_fan_out must be between 0 and" +\
+                             " 65536, shard_depth between 1 and 10 and rescan_interval positive.")
+
+        if save_format not in self.EXTENSIONS :
+
+            raise ValueError("Invalid connector configuration: save_format must be csv or binary.")
+
         self.dir_path : str = dir_path
+        self.cache : ItineraryCache | None = cache
+        self.shard_fan_out : int = shard_fan_out
+        self.shard_depth : int = shard_depth
+        self.rescan_interval : float = rescan_interval
+        self.save_format : str = save_format
+        self.index : SpatialIndex | None = index
+
+        # The sorted itinerary names and the folder modification time they reflect
+        self.names : list[str] = []
+        self.names_version : tuple[int, int] | None = None
+        self.names_lock : Lock = Lock()
+
+        # The digest of the sorted itinerary names, calculated when first requested
+        self.digest : str | None = None
 
 
     # This method retrieves a list of itineraries by name
@@ -31,35 +83,436 @@ class ItineraryConnector():
         This method retrieves all the valid itinerary names.
 
         Returns:
-            list[str]: the names of all the itineraries.
+            list[str]: the names of all the itineraries in alphabetical order.
+        """
+
+        with self.names_lock :
+
+            self.refresh_names()
+
+            return list(self.names)
+
+
+    def page_names(self, prefix : str = "", after : str | None = None, limit : int | None = None,\
+                   descending : bool = False) -> tuple[list[str], str | None] :
+
+        """
+        This method retrieves a single page of the sorted itinerary names.
+
+        Parameters:
+            prefix (str): only names starting with the prefix are retrieved.
+            after (str | None): the last name of the previous page, the page starts
+            at the first name if None.
+            limit (int | None): the maximum number of names in the page, every name is
+            retrieved if None.
+            descending (bool): the names are sorted in reverse alphabetical order if True.
+
+        Returns:
+            tuple[list[str], str | None]: the names in the page and the last name of
+            the page if there are further pages, otherwise None.
         """
 
-        files = listdir(self.dir_path)
+        # Validated input types
+        if (not isinstance(prefix, str)) or (after != None and not isinstance(after, str)) \
+            or (limit != None and not isinstance(limit, int)) :
+
+            raise TypeError("Invalid input parameters: prefix => str, after => str and limit => int.")
+
+        if limit != None and limit <= 0 :
+
+            raise ValueError("Invalid input parameter: limit must be positive.")
+
+        with self.names_lock :
+
+            self.refresh_names()
+
+            # The range of names matching the prefix is found by binary search
+            start = bisect_left(self.names, prefix)
+            end = bisect_right(self.names, prefix + "\U0010ffff", start)
+
+            # The range is narrowed to the names after the cursor
+            if after != None :
+
+                if descending :
+
+                    end = max(start, min(end, bisect_left(self.names, after, start, end)))
+
+                else :
+
+                    start = min(end, max(start, bisect_right(self.names, after, start, end)))
+
+            count = end - start if limit == None else min(limit, end - start)
+
+            if descending :
+
+                names = self.names[end - count:end][::-1]
+
+            else :
+
+                names = self.names[start:start + count]
+
+            more = count < end - start
+
+        return (names, names[-1] if more else None)
+
+
+    def names_digest(self) -> str :
+
+        """
+        This method generates a digest of the itinerary names, it changes whenever an
+        itinerary is created or deleted. The digest is only re-calculated after the
+        names change.
+
+        Returns:
+            str: the hex digest of the sorted itinerary names.
+        """
+
+        with self.names_lock :
+
+            self.refresh_names()
+
+            if self.digest == None :
+
+                self.digest = sha1("\n".join(self.names).encode("utf-8", "surrogateescape")).hexdigest()
+
+            return self.digest
+
+
+    def names_signature(self) -> tuple[int, int] :
+
+        """
+        This method generates a value which changes whenever the saves folder may have
+        changed. In the sharded layout changes to the sub-folders aren't visible from
+        the saves folder, so the signature also changes every rescan interval.
+
+        Returns:
+            tuple[int, int]: the signature of the saves folder.
+        """
+
+        interval = 0
+
+        if self.shard_fan_out > 0 :
+
+            interval = int(monotonic() // self.rescan_interval)
+
+        return (stat(self.dir_path).st_mtime_ns, interval)
+
+
+    def refresh_names(self) -> None:
+
+        """
+        This method re-scans the saves folder if it has changed since it was last
+        scanned, the caller must hold the names lock.
+        """
+
+        version = self.names_signature()
+
+        if version != self.names_version :
+
+            names = self.scan_names()
+
+            if names != self.names :
+
+                self.names = names
+                self.digest = None
+
+            self.names_version = version
+
+
+    def update_names(self, name : str, saved : bool, version : tuple[int, int]) -> None:
+
+        """
+        This method updates the name index after the connector creates or deletes a
+        save file. The folder is re-scanned later if it had changed beforehand.
+
+        Parameters:
+            name (str): The name of the itinerary.
+            saved (bool): whether the itinerary now exists.
+            version (tuple[int, int]): the folder signature before the change.
+        """
+
+        with self.names_lock :
+
+            if version != self.names_version :
+
+                self.names_version = None
+
+                return
+
+            position = bisect_left(self.names, name)
+            found = position < len(self.names) and self.names[position] == name
+
+            if saved and not found :
+
+                self.names.insert(position, name)
+                self.digest = None
+
+            elif found and not saved :
+
+                del self.names[position]
+                self.digest = None
+
+            self.names_version = self.names_signature()
+
+
+    def scan_names(self) -> list[str]:
+
+        """
+        This method lists the saves folder and every shard sub-folder.
+
+        Returns:
+            list[str]: the names of all the itineraries in alphabetical order.
+        """
 
         names = []
+        folders = [(self.dir_path, 0)]
 
-        # The itinerary names are retrieved.
-        for file in files :
+        # The folders are traversed down to the depth of the sharded layout
+        while len(folders) > 0 :
 
-            # The file types are minimally validated
-            if file[-5:] == ".save" :
-                
-                names.append(file[:-5])
+            folder, depth = folders.pop()
+
+            with scandir(folder) as entries :
+
+                for entry in entries :
+
+                    # The file types are minimally validated
+                    if entry.name[-5:] in {".save", ".itin"} :
+
+                        names.append(entry.name[:-5])
+
+                    elif self.shard_fan_out > 0 and depth < self.shard_depth and entry.is_dir() :
+
+                        folders.append((entry.path, depth + 1))
+
+        # Saves part way through a migration or conversion may be listed twice
+        names = sorted(set(names))
 
         return names
+
+
+    def shard_path(self, name : str) -> str:
+
+        """
+        This method generates the path of the folder a save is stored in. In the sharded
+        layout each level of sub-folders is selected by a different part of the hash of
+        the name.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            str: the path of the folder.
+        """
+
+        if self.shard_fan_out == 0 :
+
+            return self.dir_path
+
+        digest = sha1(name.encode("utf-8")).hexdigest()
+        width = len(f"{self.shard_fan_out - 1:x}")
+
+        folders = [f"{int(digest[4 * i:4 * i + 4], 16) % self.shard_fan_out:0{width}x}" \
+                   for i in range(self.shard_depth)]
+
+        return join(self.dir_path, *folders)
+
+
+    def file_path(self, name : str) -> str:
+
+        """
+        This method generates the path a save is written to.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            str: the path of the save file.
+        """
+
+        return self.shard_path(name) + f"/{name}" + self.EXTENSIONS[self.save_format]
+
+
+    def file_paths(self, name : str) -> list[str]:
+
+        """
+        This method generates every path a save may be stored at, in order of
+        preference. Saves which haven't been migrated to the sharded layout are
+        stored in the saves folder and saves which haven't been converted are stored
+        in the other format.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            list[str]: the possible paths of the save file.
+        """
+
+        extensions = [self.EXTENSIONS[self.save_format]]
+        extensions += [i for i in self.EXTENSIONS.values() if i not in extensions]
+
+        folders = [self.shard_path(name)]
+
+        if folders[0] != self.dir_path :
+
+            folders.append(self.dir_path)
+
+        return [folder + f"/{name}" + extension for folder in folders for extension in extensions]
+
+
+    def locate(self, name : str) -> str | None:
+
+        """
+        This method finds an existing save.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            str | None: the path of the save file or None if it doesn't exist.
+        """
+
+        for file_path in self.file_paths(name) :
+
+            if exists(file_path) :
+
+                return file_path
+
+        return None
+
+
+    def migrate(self, limit : int | None = None) -> int:
+
+        """
+        This method moves saves from the saves folder into the sharded layout. Reads,
+        writes and deletes are unaffected, so saves can be migrated while in use.
+
+        Parameters:
+            limit (int | None): the maximum number of saves to move, every save is moved
+            if None.
+
+        Returns:
+            int: the number of saves moved.
+        """
+
+        if self.shard_fan_out == 0 :
+
+            raise ValueError("Invalid migration: the connector doesn't use the sharded layout.")
+
+        moved = 0
+
+        for file in listdir(self.dir_path) :
+
+            if limit != None and moved >= limit :
+
+                break
+
+            # The file types are minimally validated
+            if file[-5:] not in {".save", ".itin"} :
+
+                continue
+
+            name = file[:-5]
+            file_path = self.shard_path(name) + f"/{file}"
+
+            try :
+
+                makedirs(self.shard_path(name), exist_ok=True)
+
+                # A save already in the sharded layout was written after the old one
+                if any(exists(self.shard_path(name) + f"/{name}" + i) for i in self.EXTENSIONS.values()) :
+
+                    remove(self.dir_path + f"/{file}")
+
+                else :
+
+                    replace(self.dir_path + f"/{file}", file_path)
+
+            except FileNotFoundError as e :
+
+                continue
+
+            except OSError as e :
+
+                raise ItineraryRequestException("The server experienced an error while migrating" +\
+                                                f" {name}")
+
+            if self.cache != None :
+
+                self.cache.invalidate(self.cache_key(name))
+
+            moved += 1
+
+        # The name index is re-scanned
+        with self.names_lock :
+
+            self.names_version = None
+
+        return moved
+
+
+    def cache_key(self, name : str) -> str:
+
+        """
+        This method generates the key of an itinerary in the cache, the key doesn't
+        depend on the layout the save is stored in.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            str: the cache key.
+        """
+
+        return self.dir_path + f"/{name}"
     
 
+    def version(self, name : str) -> tuple[str, int, int] :
+        """
+        This method retrieves the version of an itinerary's save without reading it,
+        the version changes whenever the itinerary is saved.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            tuple[str, int, int]: the path, modification time and size of the save.
+        """
+
+        # Validated input types
+        if not isinstance(name, str) :
+
+            raise TypeError("Invalid input parameter: name => str.")
+
+        # File path is located
+        file_path = self.locate(name)
+
+        # The file path is validated
+        try :
+
+            file_stat = stat(file_path)
+
+        except (OSError, TypeError) as e :
+
+            raise ItineraryRequestException("This itinerary can no longer be found")
+
+        return (file_path, file_stat.st_mtime_ns, file_stat.st_size)
+
+
     # This method generates an Itinerary object from a saved itinerary file.
-    def read(self, name : str) -> Itinerary :
+    def read(self, name : str, cache : bool = True) -> Itinerary :
         """
         This method retrieves the itinerary information from a save file.
 
         Parameters:
             name (str): The name of the itinerary.
+            cache (bool): the itinerary cache is bypassed if False, for bulk reads
+            which would otherwise push every other itinerary out of it.
 
         Returns:
             Itinerary: an Itinerary object corresponding to the data retrieved
-            from the save file.
+            from the save file. Cached itineraries are shared, so the returned
+            object must not be modified.
         """
 
         # Validated input types
@@ -67,60 +520,208 @@ class ItineraryConnector():
 
             raise TypeError("Invalid input parameter: name => str.")
 
-        itinerary = Itinerary()
-        coordinates  = []
+        # The save is located
+        version = self.version(name)
+        file_path = version[0]
 
-        # File path is created
-        file_path = self.dir_path + f"/{name}.save"
+        # The cached itinerary is returned if the file hasn't changed since it was parsed
+        if cache and self.cache != None :
 
-        # The file path is validated
-        if not exists(file_path) :
+            cached = self.cache.get(self.cache_key(name), version)
 
-            raise ItineraryRequestException("This itinerary can no longer be found")
+            if cached != None :
+
+                return cached
+
+        # The file is parsed according to its format
+        if file_path.endswith(self.EXTENSIONS["binary"]) :
+
+            itinerary = self.read_binary(file_path)
+
+        else :
+
+            itinerary = self.read_csv(file_path)
+
+        # The itinerary is cached for subsequent requests
+        if cache and self.cache != None :
+
+            self.cache.put(self.cache_key(name), version, itinerary)
+                
+        return itinerary
+
+
+    def read_csv(self, file_path : str) -> Itinerary :
+        """
+        This method parses a csv save file.
+
+        Parameters:
+            file_path (str): The path of the save file.
+
+        Returns:
+            Itinerary: an Itinerary object corresponding to the data retrieved
+            from the save file.
+        """
+
+        names = []
+        latitudes = []
+        longitudes = []
         
         # The file is read
-        with open(file_path, "r") as file :
-            
-            lines = file.readlines()
+        try :
 
-            for line in lines :
+            with open(file_path, "r") as file :
                 
-                # The coordinates are parsed
-                coordinates.append([i.strip().replace("\n", "") for i in line.split(",")])
+                lines = file.readlines()
 
-        # The file is parsed into an Itinerary object
-        for data in coordinates :
+        except OSError as e :
+
+            raise ItineraryRequestException("This itinerary can no longer be found")
+
+        # The file is parsed into columns
+        for line in lines :
             
+            data = [i.strip() for i in line.split(",")]
+
             # The data is validated
             if len(data) != 3 :
 
                 raise ItineraryRequestException("The stored itinerary has been corrupted")
 
-            latitude = 0
-            longitude = 0
-            
             # The request data is converted to numerical data
             try :
                 
-                latitude = float(data[1])
-                longitude = float(data[2])
+                latitudes.append(float(data[1]))
+                longitudes.append(float(data[2]))
 
             except ValueError as e :
     
                 raise ItineraryRequestException("The stored itinerary has been corrupted")
 
-            
-            itinerary[data[0]] = (latitude, longitude)
+            names.append(data[0])
+
+        # The columns are validated and stored as a single batch
+        try :
+
+            itinerary = Itinerary.from_columns(names, latitudes, longitudes)
+
+        except InvalidItineraryException as e :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
 
-        # The center is re-calculated upon re-creation of the itinerary.
-        itinerary.find_center()
-                
         return itinerary
 
 
+    def read_binary(self, file_path : str) -> Itinerary :
+        """
+        This method parses a binary save file, the file is memory-mapped rather than
+        read into memory.
+
+        Parameters:
+            file_path (str): The path of the save file.
+
+        Returns:
+            Itinerary: an Itinerary object corresponding to the data retrieved
+            from the save file.
+        """
+
+        try :
+
+            with open(file_path, "rb") as file, mmap(file.fileno(), 0, access=ACCESS_READ) as buffer :
+
+                return BinaryItineraryFormat.decode(buffer)
+
+        except (OSError, ValueError) as e :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+
+    def read_header(self, name : str) -> tuple[int, tuple[float, float]] :
+        """
+        This method retrieves the number of locations and the center of an itinerary.
+        Only the header of a binary save is read, the locations aren't parsed or
+        cached.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            tuple[int, tuple[float, float]]: the number of locations and the center.
+        """
+
+        # Validated input types
+        if not isinstance(name, str) :
+
+            raise TypeError("Invalid input parameter: name => str.")
+
+        version = self.version(name)
+        file_path = version[0]
+
+        # A cached itinerary needn't be read again
+        if self.cache != None :
+
+            cached = self.cache.get(self.cache_key(name), version)
+
+            if cached != None :
+
+                return (len(cached), cached.center)
+
+        # Csv saves must be parsed in full
+        if not file_path.endswith(self.EXTENSIONS["binary"]) :
+
+            itinerary = self.read(name)
+
+            return (len(itinerary), itinerary.center)
+
+        try :
+
+            with open(file_path, "rb") as file, mmap(file.fileno(), 0, access=ACCESS_READ) as buffer :
+
+                header = BinaryItineraryFormat.read_header(buffer)
+
+        except (OSError, ValueError) as e :
+
+            raise ItineraryRequestException("This itinerary can no longer be found")
+
+        return (header[0], header[1])
+
+
+    def convert(self, limit : int | None = None) -> int :
+        """
+        This method re-writes saves stored in the other format in the connector's save
+        format. Each save is written by write, so it is replaced atomically.
+
+        Parameters:
+            limit (int | None): the maximum number of saves to convert, every save is
+            converted if None.
+
+        Returns:
+            int: the number of saves converted.
+        """
+
+        converted = 0
+
+        for name in self.scan_names() :
+
+            if limit != None and converted >= limit :
+
+                break
+
+            file_path = self.locate(name)
+
+            if file_path != None and not file_path.endswith(self.EXTENSIONS[self.save_format]) :
+
+                self.write(name, self.read(name, cache=False))
+
+                converted += 1
+
+        return converted
+
+
     def write(self, name : str, itinerary : Itinerary) -> None :
         """
-        This method creates or overwrites an itinerary save file.
+        This method creates or overwrites an itinerary save file. The save is written
+        to a temporary file which then replaces it, so readers, including those with
+        the save memory mapped, only ever see a complete save.
 
         Parameters:
             name (str): The name of the itinerary.
@@ -133,23 +734,71 @@ class ItineraryConnector():
 
             raise TypeError("Invalid input parameters: name => str and itinerary => Itinerary.")
 
-        lines = ""
+        # The itinerary is converted into the save format
+        if self.save_format == "binary" :
 
-        # The itinerary is converted into a csv format
-        for coordinates in itinerary :
-            
-            lines += ",".join([str(word) for word in coordinates]) + "\n"
+            data, mode = BinaryItineraryFormat.encode(itinerary), "wb"
+
+        else :
+
+            data, mode = "".join([f"{location[0]},{location[1]},{location[2]}\n" for location in itinerary]), "w"
+
+        # File path is created
+        file_path = self.file_path(name)
+
+        version = self.names_signature()
 
         # The itinerary is written to the file
         try:
 
-            with open(self.dir_path + f"/{name}.save", "w") as file :
+            makedirs(self.shard_path(name), exist_ok=True)
+
+            # The temporary file is in the same folder, so it replaces the save atomically
+            temp_path = file_path + f".{uuid4().hex}.tmp"
+
+            try :
+
+                with open(temp_path, mode.replace("w", "x")) as file :
 
-                file.write(lines)
+                    file.write(data)
+                    file.flush()
+                    fsync(file.fileno())
+
+                replace(temp_path, file_path)
+
+            except OSError as e :
+
+                if exists(temp_path) :
+
+                    remove(temp_path)
+
+                raise
+
+            # Saves which haven't been migrated or converted are replaced
+            for other_path in self.file_paths(name)[1:] :
+
+                if exists(other_path) :
+
+                    remove(other_path)
 
         except OSError as e :
 
             raise ItineraryRequestException("The server experienced an error while saving, please try again")
+
+        finally :
+
+            # The cached itinerary is discarded immediately
+            if self.cache != None :
+
+                self.cache.invalidate(self.cache_key(name))
+
+        # The name index is updated
+        self.update_names(name, True, version)
+
+        # The spatial index is updated
+        if self.index != None :
+
+            self.index.add(name, itinerary)
         
 
     # This method deletes a given itinerary
@@ -166,22 +815,41 @@ class ItineraryConnector():
 
             raise TypeError("Invalid input parameter: name => str.")
         
-        # File path is created
-        file_path = self.dir_path + f"/{name}.save"
+        # File path is located
+        file_path = self.locate(name)
         
         # The file path is validated
-        if not exists(file_path) :
+        if file_path == None :
 
             raise ItineraryRequestException("This itinerary can no longer be found, please reload the page")
         
-        # The file is deleted
+        # The cached itinerary is discarded
+        if self.cache != None :
+
+            self.cache.invalidate(self.cache_key(name))
+
+        version = self.names_signature()
+
+        # The file is deleted, including any copy part way through a migration
         try :
             
-            remove(file_path)
+            for file_path in self.file_paths(name) :
+
+                if exists(file_path) :
+
+                    remove(file_path)
 
         except OSError as e :
 
             raise ItineraryRequestException("The server experienced an error while deleting this resource")
+
+        # The name index is updated
+        self.update_names(name, False, version)
+
+        # The spatial index is updated
+        if self.index != None :
+
+            self.index.remove(name)
             
 
             
@@ -0,0 +1,184 @@
+import sqlite3
+from os import makedirs
+from os.path import dirname
+from threading import Lock, local
+from time import time
+
+from flaskr.model.exceptions.RateLimitException import RateLimitException
+
+
+class RateLimiter :
+    """
+    This class paces the requests sent to each upstream host with a token bucket.
+    Each host's bucket refills at the rate of its quota and holds at most its burst,
+    a request takes a token or reserves the next one and waits for it. Requests
+    which would wait too long are shed. The buckets are held in memory, or in a
+    SQLite database so that every worker process shares the same quota.
+    """
+
+
+    def __init__(self, limits : dict[str, tuple[float, int]], max_wait : float = 5,\
+                 file_path : str | None = None) -> None :
+        """
+        RateLimiter object initializer
+
+        Parameters:
+            limits (dict[str, tuple[float, int]]): the number of requests per minute and
+            the burst of each host, requests to other hosts aren't limited.
+            max_wait (float): the maximum number of seconds a request may wait.
+            file_path (str | None): the path to the SQLite database file shared by
+            every process, the buckets are held in memory if None.
+        """
+
+        # Input validation
+        if max_wait < 0 or any(rate <= 0 or burst < 1 for rate, burst in limits.values()) :
+
+            raise ValueError("Invalid limiter configuration: the rates must be positive, the bursts" +\
+                             " at least 1 and max_wait must not be negative.")
+
+        self.limits : dict[str, tuple[float, int]] = dict(limits)
+        self.max_wait : float = max_wait
+        self.file_path : str | None = file_path
+
+        # The tokens and update time of each host's bucket held in memory
+        self.buckets : dict[str, tuple[float, float]] = dict()
+        self.lock : Lock = Lock()
+
+        # SQLite connections cannot be shared between threads
+        self.connections : local = local()
+
+        # The database and its table are created if they don't already exist
+        if file_path != None :
+
+            if dirname(file_path) != "" :
+
+                makedirs(dirname(file_path), exist_ok=True)
+
+            with self.connection() as connection :
+
+                connection.execute("CREATE TABLE IF NOT EXISTS buckets (" +\
+                                   "host TEXT PRIMARY KEY, " +\
+                                   "tokens REAL NOT NULL, " +\
+                                   "updated REAL NOT NULL) WITHOUT ROWID")
+
+
+    def connection(self) -> sqlite3.Connection :
+        """
+        This method retrieves the calling thread's database connection.
+
+        Returns:
+            sqlite3.Connection: the database connection.
+        """
+
+        connection = getattr(self.connections, "connection", None)
+
+        if connection == None :
+
+            # Transactions are managed explicitly so the bucket can be locked
+            connection = sqlite3.connect(self.file_path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+            self.connections.connection = connection
+
+        return connection
+
+
+    def acquire(self, host : str, max_wait : float | None = None) -> float :
+        """
+        This method takes a token from a host's bucket, or reserves the next token if
+        the bucket is empty.
+
+        Parameters:
+            host (str): the upstream host.
+            max_wait (float | None): the maximum number of seconds the request may
+            wait, by default the limiter's max_wait.
+
+        Returns:
+            float: the number of seconds to wait before sending the request.
+        """
+
+        limit = self.limits.get(host, None)
+
+        if limit == None :
+
+            return 0.0
+
+        if max_wait == None or max_wait > self.max_wait :
+
+            max_wait = self.max_wait
+
+        if self.file_path == None :
+
+            with self.lock :
+
+                tokens, updated = self.buckets.get(host, (limit[1], None))
+
+                delay, tokens, now = self.take(host, limit, tokens, updated, max_wait)
+
+                self.buckets[host] = (tokens, now)
+
+            return delay
+
+        # The bucket is locked against other processes while it is updated
+        connection = self.connection()
+
+        connection.execute("BEGIN IMMEDIATE")
+
+        try :
+
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE host = ?", (host,)).fetchone()
+
+            tokens, updated = row if row != None else (limit[1], None)
+
+            delay, tokens, now = self.take(host, limit, tokens, updated, max_wait)
+
+            connection.execute("INSERT OR REPLACE INTO buckets (host, tokens, updated) VALUES (?, ?, ?)",
+                               (host, tokens, now))
+
+        except BaseException as e :
+
+            connection.execute("ROLLBACK")
+
+            raise
+
+        connection.execute("COMMIT")
+
+        return delay
+
+
+    def take(self, host : str, limit : tuple[float, int], tokens : float, updated : float | None,\
+             max_wait : float) -> tuple[float, float, float] :
+        """
+        This method refills a bucket and takes a token from it, the tokens go negative
+        while requests are waiting for tokens which haven't been refilled yet.
+
+        Parameters:
+            host (str): the upstream host.
+            limit (tuple[float, int]): the requests per minute and burst of the host.
+            tokens (float): the tokens in the bucket when it was last updated.
+            updated (float | None): the time the bucket was last updated, None if the
+            bucket is new.
+            max_wait (float): the maximum number of seconds the request may wait.
+
+        Returns:
+            tuple[float, float, float]: the number of seconds to wait, the tokens left
+            in the bucket and the time it was updated.
+        """
+
+        rate = limit[0] / 60
+        now = time()
+
+        # The bucket is refilled for the time which has passed
+        if updated != None :
+
+            tokens = min(limit[1], tokens + max(0.0, now - updated) * rate)
+
+        delay = max(0.0, (1 - tokens) / rate)
+
+        # Requests which would wait too long are shed without taking a token
+        if delay > max_wait :
+
+            raise RateLimitException(host)
+
+        return (delay, tokens - 1, now)
@@ -0,0 +1,507 @@
+import sqlite3
+from os import makedirs
+from os.path import dirname
+from threading import local
+
+from flaskr.model.Itinerary import Itinerary
+from flaskr.model.exceptions.ItineraryRequestException import ItineraryRequestException
+from flaskr.model.exceptions.RepeatLocationException import RepeatLocationException
+from flaskr.model.exceptions.InvalidLocationException import InvalidLocationException
+from flaskr.model.exceptions.InvalidItineraryException import InvalidItineraryException
+from flaskr.model.data_access_layer.ItineraryCache import ItineraryCache
+from flaskr.model.data_access_layer.ItineraryConnector import ItineraryConnector
+from flaskr.model.data_access_layer.SpatialIndex import SpatialIndex
+
+
+class SQLiteItineraryConnector():
+    """
+    This class provides a mechanism by which itinerary information can be
+    retrieved, created and destroyed, the itineraries are stored in an indexed
+    SQLite database in WAL mode so concurrent readers don't block each other or
+    a writer.
+    """
+
+
+    def __init__(self, file_path : str, cache : ItineraryCache | None = None,\
+                 index : SpatialIndex | None = None) -> None :
+
+        """
+        SQLiteItineraryConnector object initializer
+
+        Parameters:
+            file_path (str): the path to the SQLite database file.
+            cache (ItineraryCache | None): an optional cache of parsed itineraries
+            shared between requests.
+            index (SpatialIndex | None): an optional spatial index of the stored
+            locations, kept up to date as itineraries are saved and deleted.
+        """
+
+        self.file_path : str = file_path
+        self.cache : ItineraryCache | None = cache
+        self.index : SpatialIndex | None = index
+
+        # SQLite connections cannot be shared between threads
+        self.connections : local = local()
+
+        # The database and its tables are created if they don't already exist
+        if dirname(file_path) != "" :
+
+            makedirs(dirname(file_path), exist_ok=True)
+
+        with self.connection() as connection :
+
+            connection.execute("CREATE TABLE IF NOT EXISTS itineraries (" +\
+                               "id INTEGER PRIMARY KEY, " +\
+                               "name TEXT NOT NULL UNIQUE, " +\
+                               "version INTEGER NOT NULL)")
+
+            connection.execute("CREATE TABLE IF NOT EXISTS locations (" +\
+                               "itinerary_id INTEGER NOT NULL REFERENCES itineraries (id) ON DELETE CASCADE, " +\
+                               "position INTEGER NOT NULL, " +\
+                               "name TEXT NOT NULL, " +\
+                               "latitude REAL NOT NULL, " +\
+                               "longitude REAL NOT NULL, " +\
+                               "PRIMARY KEY (itinerary_id, position)) WITHOUT ROWID")
+
+            # The generation is incremented by every change, so versions are never reused
+            # by an itinerary which is deleted and created again.
+            connection.execute("CREATE TABLE IF NOT EXISTS counters (" +\
+                               "name TEXT PRIMARY KEY, " +\
+                               "value INTEGER NOT NULL) WITHOUT ROWID")
+
+            connection.execute("INSERT OR IGNORE INTO counters (name, value) " +\
+                               "SELECT 'generation', COALESCE(MAX(version), 0) FROM itineraries")
+
+
+    def connection(self) -> sqlite3.Connection :
+        """
+        This method retrieves the calling thread's database connection.
+
+        Returns:
+            sqlite3.Connection: the database connection.
+        """
+
+        connection = getattr(self.connections, "connection", None)
+
+        if connection == None :
+
+            connection = sqlite3.connect(self.file_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+
+            self.connections.connection = connection
+
+        return connection
+
+
+    # This method retrieves a list of itineraries by name
+    def get_names(self) -> list[str]:
+
+        """
+        This method retrieves all the valid itinerary names.
+
+        Returns:
+            list[str]: the names of all the itineraries in alphabetical order.
+        """
+
+        rows = self.connection().execute("SELECT name FROM itineraries ORDER BY name").fetchall()
+
+        return [row[0] for row in rows]
+
+
+    def page_names(self, prefix : str = "", after : str | None = None, limit : int | None = None,\
+                   descending : bool = False) -> tuple[list[str], str | None] :
+
+        """
+        This method retrieves a single page of the sorted itinerary names.
+
+        Parameters:
+            prefix (str): only names starting with the prefix are retrieved.
+            after (str | None): the last name of the previous page, the page starts
+            at the first name if None.
+            limit (int | None): the maximum number of names in the page, every name is
+            retrieved if None.
+            descending (bool): the names are sorted in reverse alphabetical order if True.
+
+        Returns:
+            tuple[list[str], str | None]: the names in the page and the last name of
+            the page if there are further pages, otherwise None.
+        """
+
+        # Validated input types
+        if (not isinstance(prefix, str)) or (after != None and not isinstance(after, str)) \
+            or (limit != None and not isinstance(limit, int)) :
+
+            raise TypeError("Invalid input parameters: prefix => str, after => str and limit => int.")
+
+        if limit != None and limit <= 0 :
+
+            raise ValueError("Invalid input parameter: limit must be positive.")
+
+        # The names are selected by a range scan of the name index
+        query = "SELECT name FROM itineraries WHERE name >= ? AND name <= ?"
+        parameters = [prefix, prefix + "\U0010ffff"]
+
+        if after != None :
+
+            query += " AND name < ?" if descending else " AND name > ?"
+            parameters.append(after)
+
+        query += " ORDER BY name DESC" if descending else " ORDER BY name"
+
+        # One additional name is selected to find out if there are further pages
+        if limit != None :
+
+            query += " LIMIT ?"
+            parameters.append(limit + 1)
+
+        names = [row[0] for row in self.connection().execute(query, parameters).fetchall()]
+
+        more = limit != None and len(names) > limit
+
+        if more :
+
+            names = names[:limit]
+
+        return (names, names[-1] if more else None)
+
+
+    def names_digest(self) -> str :
+
+        """
+        This method generates a digest of the itinerary names, it changes whenever an
+        itinerary is created or deleted.
+
+        Returns:
+            str: the generation of the database, which changes with every change to the
+            itineraries.
+        """
+
+        row = self.connection().execute("SELECT value FROM counters WHERE name = 'generation'").fetchone()
+
+        return str(row[0])
+
+
+    def version(self, name : str) -> tuple[int, int] :
+        """
+        This method retrieves the version of an itinerary without reading its
+        locations, the version changes whenever the itinerary is saved.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            tuple[int, int]: the id and version of the itinerary.
+        """
+
+        # Validated input types
+        if not isinstance(name, str) :
+
+            raise TypeError("Invalid input parameter: name => str.")
+
+        row = self.connection().execute("SELECT id, version FROM itineraries WHERE name = ?", (name,)).fetchone()
+
+        # The itinerary is validated
+        if row == None :
+
+            raise ItineraryRequestException("This itinerary can no longer be found")
+
+        return (row[0], row[1])
+
+
+    # This method generates an Itinerary object from the database.
+    def read(self, name : str, cache : bool = True) -> Itinerary :
+        """
+        This method retrieves the itinerary information from the database.
+
+        Parameters:
+            name (str): The name of the itinerary.
+            cache (bool): the itinerary cache is bypassed if False, for bulk reads
+            which would otherwise push every other itinerary out of it.
+
+        Returns:
+            Itinerary: an Itinerary object corresponding to the data retrieved
+            from the database. Cached itineraries are shared, so the returned
+            object must not be modified.
+        """
+
+        # Validated input types
+        if not isinstance(name, str) :
+
+            raise TypeError("Invalid input parameter: name => str.")
+
+        connection = self.connection()
+
+        # The version and locations are read from a single snapshot, so a concurrent
+        # save can't pair the locations with a different version
+        with connection :
+
+            connection.execute("BEGIN")
+
+            # The itinerary is looked up by the name index
+            row = self.version(name)
+
+            # The cached itinerary is returned if it hasn't changed since it was read
+            if cache and self.cache != None :
+
+                cached = self.cache.get(self.cache_key(name), row[1])
+
+                if cached != None :
+
+                    return cached
+
+            # The locations are read in order by a range scan of the primary key
+            locations = connection.execute("SELECT name, latitude, longitude FROM locations " +\
+                                           "WHERE itinerary_id = ? ORDER BY position", (row[0],)).fetchall()
+
+        # The locations are validated and stored as a single batch
+        try :
+
+            itinerary = Itinerary.from_records(locations)
+
+        except InvalidItineraryException as e :
+
+            raise ItineraryRequestException("The stored itinerary has been corrupted")
+
+        # The itinerary is cached for subsequent requests
+        if cache and self.cache != None :
+
+            self.cache.put(self.cache_key(name), row[1], itinerary)
+
+        return itinerary
+
+
+    def read_header(self, name : str) -> tuple[int, tuple[float, float]] :
+        """
+        This method retrieves the number of locations and the center of an itinerary,
+        the counterpart of ItineraryConnector.read_header. The center is calculated
+        from the stored locations.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            tuple[int, tuple[float, float]]: the number of locations and the center.
+        """
+
+        itinerary = self.read(name)
+
+        return (len(itinerary), itinerary.center)
+
+
+    def write(self, name : str, itinerary : Itinerary) -> None :
+        """
+        This method creates or overwrites an itinerary in the database.
+
+        Parameters:
+            name (str): The name of the itinerary.
+            itinerary (Itinerary): An itinerary object encapsulating the itinerary
+            information.
+        """
+
+        # Input validation
+        if not isinstance(name, str) or not isinstance(itinerary, Itinerary) :
+
+            raise TypeError("Invalid input parameters: name => str and itinerary => Itinerary.")
+
+        connection = self.connection()
+
+        try :
+
+            with connection :
+
+                connection.execute("BEGIN IMMEDIATE")
+
+                self.store(connection, name, itinerary)
+
+        except sqlite3.Error as e :
+
+            raise ItineraryRequestException("The server experienced an error while saving, please try again")
+
+        finally :
+
+            # The cached itinerary is discarded immediately
+            if self.cache != None :
+
+                self.cache.invalidate(self.cache_key(name))
+
+        # The spatial index is updated
+        if self.index != None :
+
+            self.index.add(name, itinerary)
+
+
+    def store(self, connection : sqlite3.Connection, name : str, itinerary : Itinerary) -> None :
+        """
+        This method creates or overwrites an itinerary within the caller's transaction,
+        which must have been started with BEGIN IMMEDIATE so the name can't be
+        created concurrently between the lookup and the insert.
+
+        Parameters:
+            connection (sqlite3.Connection): the database connection.
+            name (str): The name of the itinerary.
+            itinerary (Itinerary): An itinerary object encapsulating the itinerary
+            information.
+        """
+
+        row = connection.execute("SELECT id FROM itineraries WHERE name = ?", (name,)).fetchone()
+
+        version = self.increment(connection)
+
+        # The itinerary's version is replaced by the generation when it is overwritten
+        if row == None :
+
+            itinerary_id = connection.execute("INSERT INTO itineraries (name, version) VALUES (?, ?)",
+                                              (name, version)).lastrowid
+
+        else :
+
+            itinerary_id = row[0]
+
+            connection.execute("UPDATE itineraries SET version = ? WHERE id = ?", (version, itinerary_id))
+            connection.execute("DELETE FROM locations WHERE itinerary_id = ?", (itinerary_id,))
+
+        connection.executemany("INSERT INTO locations (itinerary_id, position, name, latitude, longitude) " +\
+                               "VALUES (?, ?, ?, ?, ?)",
+                               [(itinerary_id, i, location[0], location[1], location[2]) \
+                                for i, location in enumerate(itinerary)])
+
+
+    def increment(self, connection : sqlite3.Connection) -> int :
+        """
+        This method increments the generation of the database within the caller's
+        transaction.
+
+        Parameters:
+            connection (sqlite3.Connection): the database connection.
+
+        Returns:
+            int: the new generation.
+        """
+
+        connection.execute("UPDATE counters SET value = value + 1 WHERE name = 'generation'")
+
+        return connection.execute("SELECT value FROM counters WHERE name = 'generation'").fetchone()[0]
+
+
+    # This method deletes a given itinerary
+    def delete(self, name : str) -> None :
+        """
+        This method deletes an itinerary from the database.
+
+        Parameters:
+            name (str): The name of the itinerary to be deleted
+        """
+
+        # Validated input types
+        if (not isinstance(name, str)) :
+
+            raise TypeError("Invalid input parameter: name => str.")
+
+        # The cached itinerary is discarded
+        if self.cache != None :
+
+            self.cache.invalidate(self.cache_key(name))
+
+        # The itinerary and its locations are deleted
+        try :
+
+            with self.connection() as connection :
+
+                deleted = connection.execute("DELETE FROM itineraries WHERE name = ?", (name,)).rowcount
+
+                if deleted > 0 :
+
+                    self.increment(connection)
+
+        except sqlite3.Error as e :
+
+            raise ItineraryRequestException("The server experienced an error while deleting this resource")
+
+        # The itinerary is validated
+        if deleted == 0 :
+
+            raise ItineraryRequestException("This itinerary can no longer be found, please reload the page")
+
+        # The spatial index is updated
+        if self.index != None :
+
+            self.index.remove(name)
+
+
+    def import_saves(self, source : ItineraryConnector, batch_size : int = 500) -> tuple[int, list[str]] :
+        """
+        This method copies every itinerary from a save file store into the database.
+        The itineraries are written in batches, each within a single transaction.
+
+        Parameters:
+            source (ItineraryConnector): the save file store.
+            batch_size (int): the number of itineraries written per transaction.
+
+        Returns:
+            tuple[int, list[str]]: the number of itineraries imported and the names of
+            the itineraries which couldn't be read.
+        """
+
+        imported = 0
+        failed = []
+
+        names = source.get_names()
+        connection = self.connection()
+
+        for i in range(0, len(names), batch_size) :
+
+            itineraries = []
+
+            # Corrupted saves are skipped and reported
+            for name in names[i:i + batch_size] :
+
+                try :
+
+                    itineraries.append((name, source.read(name, cache=False)))
+
+                except (ItineraryRequestException, RepeatLocationException, InvalidLocationException) as e :
+
+                    failed.append(name)
+
+            with connection :
+
+                connection.execute("BEGIN IMMEDIATE")
+
+                for name, itinerary in itineraries :
+
+                    self.store(connection, name, itinerary)
+
+            # The cached itineraries are discarded
+            if self.cache != None :
+
+                for name, itinerary in itineraries :
+
+                    self.cache.invalidate(self.cache_key(name))
+
+            # The spatial index is updated
+            if self.index != None :
+
+                for name, itinerary in itineraries :
+
+                    self.index.add(name, itinerary)
+
+            imported += len(itineraries)
+
+        return (imported, failed)
+
+
+    def cache_key(self, name : str) -> str:
+
+        """
+        This method generates the key of an itinerary in the cache.
+
+        Parameters:
+            name (str): The name of the itinerary.
+
+        Returns:
+            str: the cache key.
+        """
+
+        return self.file_path + f"/{name}"
@@ -0,0 +1,114 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight :
+    """
+    This class coalesces concurrent identical requests. While a request for a key is
+    in flight, every other caller asking for the same key waits for that request and
+    shares its result or exception rather than sending a request of its own.
+    """
+
+
+    def __init__(self) -> None :
+        """
+        SingleFlight object initializer
+        """
+
+        # The requests in flight on worker threads
+        self.calls : dict[Hashable, Future] = dict()
+        self.lock : Lock = Lock()
+
+        # The requests in flight on the asyncio event loop
+        self.tasks : dict[Hashable, asyncio.Future] = dict()
+
+
+    def do(self, key : Hashable, function : Callable[..., Any], *args : Any) -> Any :
+        """
+        This method calls a function unless a call with the same key is already in
+        flight, in which case the result of that call is returned.
+
+        Parameters:
+            key (Hashable): the key identifying identical requests.
+            function (Callable): the function which sends the request.
+            args (Any): the arguments of the function.
+
+        Returns:
+            Any: the result of the function.
+        """
+
+        with self.lock :
+
+            future = self.calls.get(key, None)
+            leader = future == None
+
+            if leader :
+
+                future = Future()
+                self.calls[key] = future
+
+        # Followers wait for the leader's result
+        if not leader :
+
+            return future.result()
+
+        try :
+
+            result = function(*args)
+
+        except BaseException as e :
+
+            future.set_exception(e)
+
+            raise
+
+        else :
+
+            future.set_result(result)
+
+        finally :
+
+            with self.lock :
+
+                del self.calls[key]
+
+        return result
+
+
+    async def do_async(self, key : Hashable, function : Callable[..., Awaitable[Any]], *args : Any) -> Any :
+        """
+        This coroutine is the asynchronous counterpart of do, every caller must share
+        the same event loop.
+
+        Parameters:
+            key (Hashable): the key identifying identical requests.
+            function (Callable): the coroutine function which sends the request.
+            args (Any): the arguments of the coroutine function.
+
+        Returns:
+            Any: the result of the coroutine.
+        """
+
+        task = self.tasks.get(key, None)
+
+        if task == None :
+
+            # The finished request is forgotten and its exception marked as retrieved
+            # in case every caller was cancelled before it completed.
+            def forget(done : asyncio.Future) -> None :
+
+                self.tasks.pop(key, None)
+
+                if not done.cancelled() :
+
+                    done.exception()
+
+            task = asyncio.ensure_future(function(*args))
+            task.add_done_callback(forget)
+
+            self.tasks[key] = task
+
+        # Cancelling one caller must not cancel the request shared by the others
+        return await asyncio.shield(task)
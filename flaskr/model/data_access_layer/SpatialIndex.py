@@ -0,0 +1,354 @@
+from threading import Lock
+import math
+
+from flaskr.model.Itinerary import Itinerary
+from flaskr.model.exceptions.ItineraryRequestException import ItineraryRequestException
+
+
+class SpatialIndex :
+    """
+    This class provides a process-wide, thread-safe, in-memory grid index of the
+    locations of every saved itinerary. The globe is divided into cells of equal
+    latitude and longitude, so a nearby query only measures the distance to the
+    locations in the few cells which overlap its radius.
+    """
+
+
+    # The mean radius of the earth in kilometres
+    EARTH_RADIUS = 6371.0088
+
+    # The length of a degree of latitude in kilometres
+    DEGREE_LENGTH = math.pi * EARTH_RADIUS / 180
+
+
+    def __init__(self, cell_size : float = 0.1) -> None :
+        """
+        SpatialIndex object initializer
+
+        Parameters:
+            cell_size (float): the height and width of a cell in degrees, 0.1 by
+            default (~11km of latitude).
+        """
+
+        # Input validation
+        if cell_size <= 0 or cell_size > 90 :
+
+            raise ValueError("Invalid index configuration: cell_size must be between 0 and 90 degrees.")
+
+        self.cell_size : float = cell_size
+        self.columns : int = math.ceil(360 / cell_size)
+
+        # The locations of each itinerary by cell, and the cells of each itinerary. The
+        # radians and cosine of the latitude of each location are stored alongside it.
+        self.cells : dict[tuple[int, int], dict[str, list[tuple[str, float, float, float, float, float]]]] = dict()
+        self.itineraries : dict[str, set[tuple[int, int]]] = dict()
+        self.lock : Lock = Lock()
+
+        # The itineraries changed while the index is being built
+        self.changed : set[str] | None = None
+
+
+    def cell(self, latitude : float, longitude : float) -> tuple[int, int] :
+        """
+        This method finds the cell a location falls within.
+
+        Parameters:
+            latitude (float): the latitude of the location.
+            longitude (float): the longitude of the location.
+
+        Returns:
+            tuple[int, int]: the row and column of the cell.
+        """
+
+        return (math.floor((latitude + 90) / self.cell_size),
+                math.floor((longitude + 180) / self.cell_size) % self.columns)
+
+
+    def build(self, connector : "ItineraryConnector | SQLiteItineraryConnector") -> int :
+        """
+        This method indexes every saved itinerary, the app may keep saving and deleting
+        itineraries while the index is built. The itineraries are read around the
+        itinerary cache, so the build doesn't push the itineraries in use out of it.
+
+        Parameters:
+            connector (ItineraryConnector | SQLiteItineraryConnector): the itinerary
+            connector the itineraries are read from.
+
+        Returns:
+            int: the number of itineraries indexed.
+        """
+
+        with self.lock :
+
+            self.changed = set()
+
+        indexed = 0
+
+        try :
+
+            for name in connector.get_names() :
+
+                # Corrupted saves are skipped
+                try :
+
+                    itinerary = connector.read(name, cache=False)
+
+                except ItineraryRequestException as e :
+
+                    continue
+
+                # Itineraries saved or deleted since they were read are already up to date
+                with self.lock :
+
+                    if name not in self.changed :
+
+                        self.insert(name, itinerary)
+                        indexed += 1
+
+        finally :
+
+            with self.lock :
+
+                self.changed = None
+
+        return indexed
+
+
+    def add(self, name : str, itinerary : Itinerary) -> None :
+        """
+        This method indexes the locations of an itinerary, replacing any locations
+        previously indexed under the same name.
+
+        Parameters:
+            name (str): the name of the itinerary.
+            itinerary (Itinerary): the itinerary.
+        """
+
+        with self.lock :
+
+            self.insert(name, itinerary)
+
+            if self.changed != None :
+
+                self.changed.add(name)
+
+
+    def remove(self, name : str) -> None :
+        """
+        This method removes the locations of an itinerary from the index.
+
+        Parameters:
+            name (str): the name of the itinerary.
+        """
+
+        with self.lock :
+
+            self.discard(name)
+
+            if self.changed != None :
+
+                self.changed.add(name)
+
+
+    def insert(self, name : str, itinerary : Itinerary) -> None :
+        """
+        This method indexes the locations of an itinerary, the caller must hold the
+        lock.
+
+        Parameters:
+            name (str): the name of the itinerary.
+            itinerary (Itinerary): the itinerary.
+        """
+
+        self.discard(name)
+
+        cells = set()
+
+        for location in itinerary :
+
+            cell = self.cell(location[1], location[2])
+
+            latitude = math.radians(location[1])
+
+            self.cells.setdefault(cell, dict()).setdefault(name, []).append(
+                location + (latitude, math.radians(location[2]), math.cos(latitude)))
+            cells.add(cell)
+
+        self.itineraries[name] = cells
+
+
+    def discard(self, name : str) -> None :
+        """
+        This method removes the locations of an itinerary from every cell, the caller
+        must hold the lock.
+
+        Parameters:
+            name (str): the name of the itinerary.
+        """
+
+        for cell in self.itineraries.pop(name, ()) :
+
+            entries = self.cells[cell]
+            del entries[name]
+
+            # Empty cells are discarded
+            if len(entries) == 0 :
+
+                del self.cells[cell]
+
+
+    def locations(self, name : str) -> list[tuple[float, float]] | None :
+        """
+        This method retrieves the coordinates of every indexed location of an
+        itinerary, in no particular order.
+
+        Parameters:
+            name (str): the name of the itinerary.
+
+        Returns:
+            list[tuple[float, float]] | None: the latitude and longitude of each
+            location, or None if the itinerary isn't indexed.
+        """
+
+        with self.lock :
+
+            cells = self.itineraries.get(name, None)
+
+            if cells == None :
+
+                return None
+
+            return [(location[1], location[2]) for cell in cells for location in self.cells[cell][name]]
+
+
+    def nearby(self, latitude : float, longitude : float, radius : float, limit : int | None = None) \
+        -> list[tuple[str, str, float, float, float]] :
+        """
+        This method finds the indexed locations within a radius of a point.
+
+        Parameters:
+            latitude (float): the latitude of the point.
+            longitude (float): the longitude of the point.
+            radius (float): the radius in kilometres.
+            limit (int | None): the maximum number of locations found, every location
+            is found if None.
+
+        Returns:
+            list[tuple[str, str, float, float, float]]: the itinerary name, location
+            name, latitude, longitude and distance in kilometres of each location,
+            nearest first.
+        """
+
+        # Validated input types
+        if not isinstance(latitude, float) or not isinstance(longitude, float) \
+            or not isinstance(radius, float) or (limit != None and not isinstance(limit, int)) :
+
+            raise TypeError("Invalid input parameters: latitude => float, longitude => float, " +\
+                            "radius => float and limit => int.")
+
+        if latitude < -90 or latitude > 90 or longitude < -180 or longitude > 180 or radius < 0 :
+
+            raise ValueError("Invalid input parameters: the coordinates are out of range or the " +\
+                             "radius is negative.")
+
+        # The rows which overlap the radius
+        span = radius / SpatialIndex.DEGREE_LENGTH
+
+        first_row = self.cell(max(-90.0, latitude - span), longitude)[0]
+        last_row = self.cell(min(90.0, latitude + span), longitude)[0]
+
+        # The columns which overlap the radius, every column if the radius reaches a pole
+        if latitude - span <= -90 or latitude + span >= 90 :
+
+            columns = range(self.columns)
+
+        else :
+
+            width = span / math.cos(math.radians(abs(latitude) + span))
+
+            if 2 * width >= 360 :
+
+                columns = range(self.columns)
+
+            else :
+
+                first_column = math.floor((longitude - width + 180) / self.cell_size)
+                last_column = math.floor((longitude + width + 180) / self.cell_size)
+
+                columns = {column % self.columns for column in range(first_column, last_column + 1)}
+
+        radians_latitude = math.radians(latitude)
+        radians_longitude = math.radians(longitude)
+        cos_latitude = math.cos(radians_latitude)
+
+        # The locations are compared by their haversine rather than their distance
+        angle = radius / SpatialIndex.EARTH_RADIUS
+        limit_haversine = math.sin(min(math.pi, angle) / 2) ** 2
+        sin = math.sin
+
+        found = []
+
+        with self.lock :
+
+            for row in range(first_row, last_row + 1) :
+
+                for column in columns :
+
+                    entries = self.cells.get((row, column), None)
+
+                    if entries == None :
+
+                        continue
+
+                    for name, locations in entries.items() :
+
+                        for location in locations :
+
+                            # Locations further north or south than the radius are skipped
+                            if abs(location[3] - radians_latitude) > angle :
+
+                                continue
+
+                            haversine = sin((location[3] - radians_latitude) / 2) ** 2 + cos_latitude * \
+                                location[5] * sin((location[4] - radians_longitude) / 2) ** 2
+
+                            if haversine <= limit_haversine :
+
+                                found.append((haversine, name, location))
+
+        found.sort(key=lambda location : location[0])
+
+        if limit != None :
+
+            found = found[:limit]
+
+        found = [(name, location[0], location[1], location[2], self.distance(haversine)) \
+                 for haversine, name, location in found]
+
+        return found
+
+
+    def distance(self, haversine : float) -> float :
+        """
+        This method converts the haversine of the angle between two points into the
+        great-circle distance between them.
+
+        Parameters:
+            haversine (float): the haversine of the angle between the points.
+
+        Returns:
+            float: the distance in kilometres.
+        """
+
+        return 2 * SpatialIndex.EARTH_RADIUS * math.asin(math.sqrt(min(1.0, haversine)))
+
+
+    def __len__(self) -> int :
+        """
+        This method returns the number of indexed itineraries.
+
+        Returns:
+            int: the number of indexed itineraries.
+        """
+
+        return self.itineraries.__len__()
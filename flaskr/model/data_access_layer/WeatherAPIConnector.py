@@ -1,10 +1,20 @@
+import aiohttp
+import asyncio
+import math
 import requests
-from threading import Thread, Lock
+from threading import Lock, Thread
 
 from flaskr.model.exceptions.InvalidUnitException import InvalidUnitException
 from flaskr.model.exceptions.WeatherRequestException import WeatherRequestException
 from flaskr.model.exceptions.InvalidLocationException import InvalidLocationException
+from flaskr.model.exceptions.CircuitOpenException import CircuitOpenException
+from flaskr.model.exceptions.RateLimitException import RateLimitException
 from flaskr.model.Weather import Weather
+from flaskr.model.data_access_layer.AsyncFanOut import AsyncFanOut
+from flaskr.model.data_access_layer.HTTPClient import HTTPClient
+from flaskr.model.data_access_layer.SingleFlight import SingleFlight
+from flaskr.model.data_access_layer.WeatherCache import WeatherCache
+from flaskr.model.data_access_layer.WorkerPool import WorkerPool
 
 
 
@@ -17,16 +27,44 @@ class WeatherAPIConnector :
     # This url is the current weather data api endpoint
     URL = "https://api.openweathermap.org/data/2.5/weather"
 
+    # The mean radius of the earth in kilometres
+    EARTH_RADIUS = 6371.0088
 
-    def __init__(self, api_key : str) -> None :
+
+    def __init__(self, api_key : str, cache : WeatherCache | None = None,\
+                 pool : WorkerPool | None = None, http : HTTPClient | None = None,\
+                 fan_out : AsyncFanOut | None = None, cluster_radius : float = 0) -> None :
         """
         WeatherAPIConnector object initializer
 
         Parameters:
             api_key (str): a valid OpenWeather API key.
+            cache (WeatherCache | None): an optional cache shared between requests.
+            pool (WorkerPool | None): an optional worker pool shared between requests.
+            http (HTTPClient | None): an optional HTTP client shared between connectors.
+            fan_out (AsyncFanOut | None): an optional event loop shared between requests.
+            cluster_radius (float): the distance in kilometres within which the coordinates
+            of a bulk request share a single upstream request, only identical coordinates
+            are merged if 0.
         """
 
+        # Input validation
+        if cluster_radius < 0 :
+
+            raise ValueError("Invalid connector configuration: cluster_radius must not be negative.")
+
+        self.api_key : str = api_key
         self.url : str = self.URL + f"?appid={api_key}"
+        self.fan_out : AsyncFanOut | None = fan_out
+        self.http : HTTPClient = http if http != None else HTTPClient()
+        self.cache : WeatherCache | None = cache
+        self.pool : WorkerPool | None = pool
+        self.cluster_radius : float = cluster_radius
+        self.single_flight : SingleFlight = SingleFlight()
+
+        # The cache keys being refreshed in the background
+        self.refreshing : set[tuple[float, float, str]] = set()
+        self.lock : Lock = Lock()
 
     
     def current_weather(self, latitude : float, longitude : float, units : str = "metric") -> Weather:
@@ -67,12 +105,60 @@ class WeatherAPIConnector :
             raise InvalidUnitException(units)
         
 
-        # The request is sent
-        response = requests.get(self.url, params = {
-            "lat" : latitude, 
-            "lon" : longitude,
-            "units" : units
-            })
+        # Cached weather data is returned if it is still valid, expired data within the
+        # stale window is returned immediately and refreshed in the background.
+        if self.cache != None :
+
+            weather, fresh = self.cache.lookup(latitude, longitude, units)
+
+            if weather != None :
+
+                if not fresh :
+
+                    self.revalidate(latitude, longitude, units)
+
+                return weather
+
+
+        # Concurrent identical requests are coalesced into a single upstream request
+        weather = self.single_flight.do(self.flight_key(latitude, longitude, units),\
+                                        self.request_weather, latitude, longitude, units)
+
+        # A shared result is returned with the requested coordinates
+        if weather.coordinates != [latitude, longitude] :
+
+            weather = Weather(latitude, longitude, **weather.main)
+
+        return weather
+
+
+    def request_weather(self, latitude : float, longitude : float, units : str) -> Weather:
+        """
+        This method sends a current weather request to the OpenWeather API and caches the
+        result, the input parameters are expected to have been validated.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the latitude
+            units (str): the units of the weather data.
+
+        Returns:
+            Weather: A Weather object encapsulating the Weather data retrieved from the api.
+        """
+
+        # The request is sent, network failures, unavailable hosts and exhausted quotas
+        # are reported as failed requests
+        try :
+
+            response = self.http.get(self.url, params = {
+                "lat" : latitude, 
+                "lon" : longitude,
+                "units" : units
+                })
+
+        except (requests.exceptions.RequestException, CircuitOpenException, RateLimitException) as e :
+
+            raise WeatherRequestException()
         
 
         weather_data : dict | None = None
@@ -95,157 +181,528 @@ class WeatherAPIConnector :
 
 
         # A Weather object is created
-        weather = Weather(
-            latitude, 
-            longitude,
-            weather_data.get("main", dict()).get("temp", None),
-            weather_data.get("main", dict()).get("temp_min", None),
-            weather_data.get("main", dict()).get("temp_max", None), 
-            weather_data.get("main", dict()).get("feels_like", None),
-            weather_data.get("main", dict()).get("humidity", None),
-            weather_data.get("weather", [dict()])[0].get("description", None),
-            weather_data.get("wind", dict()).get("speed", None),
-            weather_data.get("rain", dict()).get("1h", None),
-            weather_data.get("visibility", None)
-        )
+        weather = self.parse_weather(latitude, longitude, weather_data)
+
+        # The weather data is cached for subsequent requests
+        if self.cache != None :
+
+            self.cache.put(latitude, longitude, units, weather)
 
         return weather
     
 
 
-    def bulk_weather(self, latitudes : list[float], longitudes : list[float], units : str = "metric") -> list[Weather]:
+    def refresh_weather(self, latitude : float, longitude : float, units : str) -> Weather:
+        """
+        This method retrieves the current weather data from the OpenWeather API whether
+        or not it is cached, the input parameters are expected to have been validated.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the latitude
+            units (str): the units of the weather data.
+
+        Returns:
+            Weather: A Weather object encapsulating the Weather data retrieved from the api.
+        """
+
+        # A refresh shares any identical request already in flight
+        return self.single_flight.do(self.flight_key(latitude, longitude, units),\
+                                     self.request_weather, latitude, longitude, units)
+
+
+    def revalidate(self, latitude : float, longitude : float, units : str) -> None:
+        """
+        This method refreshes expired weather data in the background, at most one
+        refresh of a cache entry runs at a time. The expired data continues to be
+        served until the stale window passes if the refresh fails.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the latitude
+            units (str): the units of the weather data.
+        """
+
+        key = self.flight_key(latitude, longitude, units)
+
+        with self.lock :
+
+            if key in self.refreshing :
+
+                return
+
+            self.refreshing.add(key)
+
+        def refresh() -> None :
+
+            try :
+
+                self.refresh_weather(latitude, longitude, units)
+
+            except WeatherRequestException as e :
+
+                pass
+
+            finally :
+
+                with self.lock :
+
+                    self.refreshing.discard(key)
+
+        # The refresh runs on the worker pool, or its own thread when none is shared
+        try :
+
+            if self.pool != None :
+
+                self.pool.submit(refresh)
+
+            else :
+
+                Thread(target=refresh, daemon=True).start()
+
+        except RuntimeError as e :
+
+            # The pool has been shut down
+            with self.lock :
+
+                self.refreshing.discard(key)
+
+
+
+    def bulk_weather(self, latitudes : list[float], longitudes : list[float], units : str = "metric",\
+                     limit : int | None = None) -> list[Weather | WeatherRequestException]:
         """
         This method retrieves the weather data corresponding to a list of coordinates. This
-        method utilizes threading to perform a bulk request.
+        method utilizes a pool of worker threads to perform a bulk request, a failed
+        request doesn't affect the others.
 
         Parameters:
             latitudes (list[float]): a list of latitudes
             longitudes (list[float]): a list of longitudes
             units (str): an optional paramter to set the units, "metric" by default.
+            limit (int | None): the maximum number of concurrent requests, by default
+            the worker pool's limit.
 
         Returns:
-            list[Weather]: A list of Weather objects encapsulating the weather data retrieved
-            from the api.
+            list[Weather | WeatherRequestException]: A list of Weather objects encapsulating
+            the weather data retrieved from the api, or the exception raised, of each
+            coordinate. WeatherRequestException is raised if every request failed.
         """
 
 
-        # Raise TypeError for invalid input type
-        if (not isinstance(latitudes, list)) or (not isinstance(longitudes, list)) :
+        # The input parameters are validated
+        self.validate_bulk(latitudes, longitudes, units)
 
-            raise TypeError("Invalid parameters, a list of latitudes and a list of longitudes" +\
-                            " is required.")
-        
+        # Nearby coordinates share a single request
+        cluster_latitudes, cluster_longitudes, clusters = self.cluster(latitudes, longitudes)
 
-        # Raise ValueError when the number of latitude and longitude values is unequal.
-        if len(latitudes) != len(longitudes) :
 
-            raise ValueError("Invalid parameters, the number of latitude and longitude values" +\
-                             " must be the same.")
+        # The requests are fanned out over the worker pool, a temporary pool is used
+        # when none is shared.
+        pool = self.pool if self.pool != None else WorkerPool()
 
+        weather_list = []
 
-        # Raise TypeError for invalid input type
-        for i in range(len(latitudes)) :
+        try :
 
-            if (not isinstance(latitudes[i], float)) or (not isinstance(longitudes[i], float)) :
+            for future in pool.imap(self.current_weather, [(cluster_latitudes[i], cluster_longitudes[i], units) \
+                                                           for i in range(len(cluster_latitudes))], limit) :
 
-                raise TypeError("The latitudes and longitudes must be valid numerical values (floats).")
-        
+                exception = future.exception()
 
-        # Raise InvalidLocationException if the coordinates are invalid
-        for i in range(len(latitudes)) :
+                # Unexpected exceptions are reported as failed requests
+                if exception == None :
 
-            if latitudes[i] < -90 or latitudes[i] > 90 or longitudes[i] < -180  or longitudes[i] > 180 :
+                    weather_list.append(future.result())
 
-                raise InvalidLocationException((latitudes[i], longitudes[i]))
-        
+                elif isinstance(exception, WeatherRequestException) :
 
-        # Input units validation
-        if (not isinstance(units, str)) :
+                    weather_list.append(exception)
 
-            raise TypeError("Invalid argument, the units value should be a string.")
-        
+                else :
 
-        # Unit type is validated
-        if units not in {"metric", "imperial"} :
+                    weather_list.append(WeatherRequestException())
 
-            raise InvalidUnitException(units)
-        
+        finally :
 
-        # The variable shared between threads - to store weather data
-        weather_list = [None for i in latitudes]
+            if pool != self.pool :
 
+                pool.shutdown()
 
-        # This function requests the data and then safely allocates the result to a shared
-        # variable that is mutex locked.
-        def threaded_weather(pos : int, thread_lock : Lock, latitude : float,\
-                             longitude : float, units : str = "metric") -> None:
-            
-            weather = self.current_weather(latitude, longitude, units)
-            
-            # safely lock the thread
-            with thread_lock :
+        return self.expand(weather_list, latitudes, longitudes, clusters)
 
-                weather_list[pos] = weather
 
 
-        # A container for the threads.
-        threads = []
+    def fan_out_weather(self, latitudes : list[float], longitudes : list[float],\
+                        units : str = "metric", deadline : float | None = None) \
+        -> list[Weather | WeatherRequestException]:
+        """
+        This method retrieves the weather data corresponding to a list of coordinates. This
+        method runs every request concurrently on the shared asyncio event loop, rather
+        than occupying a thread per request. A failed request doesn't affect the others.
 
-        # A mutex lock
-        thread_lock = Lock()
+        Parameters:
+            latitudes (list[float]): a list of latitudes
+            longitudes (list[float]): a list of longitudes
+            units (str): an optional paramter to set the units, "metric" by default.
+            deadline (float | None): the number of seconds the whole request may take,
+            by default the event loop's deadline.
 
-        # Create threads
-        for i in range(len(latitudes)) :
+        Returns:
+            list[Weather | WeatherRequestException]: A list of Weather objects encapsulating
+            the weather data retrieved from the api, or the exception raised, of each
+            coordinate. WeatherRequestException is raised if every request failed.
+        """
+
+        # The input parameters are validated
+        self.validate_bulk(latitudes, longitudes, units)
+
+        # Fall back to the worker pool when no event loop is shared
+        if self.fan_out == None :
+
+            return self.bulk_weather(latitudes, longitudes, units)
+
+        # Nearby coordinates share a single request
+        cluster_latitudes, cluster_longitudes, clusters = self.cluster(latitudes, longitudes)
+
+        calls = [lambda session, latitude=cluster_latitudes[i], longitude=cluster_longitudes[i] : \
+                 self.current_weather_async(session, latitude, longitude, units) \
+                 for i in range(len(cluster_latitudes))]
+
+        # Requests which failed or didn't complete by the deadline are reported as
+        # failed requests
+        weather_list = [weather if isinstance(weather, (Weather, WeatherRequestException)) \
+                        else WeatherRequestException() \
+                        for weather in self.fan_out.gather(calls, deadline, return_exceptions=True)]
+
+        return self.expand(weather_list, latitudes, longitudes, clusters)
+
+
+    def cluster(self, latitudes : list[float], longitudes : list[float]) \
+        -> tuple[list[float], list[float], list[int]]:
+        """
+        This method merges each coordinate into the first earlier coordinate within the
+        cluster radius, so a single request is sent for each cluster. The coordinates
+        are bucketed into a grid of cells the size of the radius so each is only
+        compared with the clusters in its neighbouring cells.
+
+        Parameters:
+            latitudes (list[float]): a list of latitudes
+            longitudes (list[float]): a list of longitudes
+
+        Returns:
+            tuple[list[float], list[float], list[int]]: the latitudes and longitudes of
+            the first coordinate of each cluster, and the cluster of each coordinate.
+        """
+
+        cluster_latitudes = []
+        cluster_longitudes = []
+        clusters = []
+
+        # Identical coordinates are always merged
+        exact : dict[tuple[float, float], int] = dict()
+
+        # The clusters by cell, a cell spans the radius in latitude and the same
+        # number of degrees of longitude
+        cells : dict[tuple[int, int], list[int]] = dict()
+        angle = self.cluster_radius / WeatherAPIConnector.EARTH_RADIUS
+        span = math.degrees(angle)
+        columns = math.ceil(360 / span) if span > 0 else 0
+        limit_haversine = math.sin(min(math.pi, angle) / 2) ** 2
+
+        for latitude, longitude in zip(latitudes, longitudes) :
+
+            cluster = exact.get((latitude, longitude), None)
+
+            if cluster == None and span > 0 :
+
+                row = math.floor((latitude + 90) / span)
+                column = math.floor((longitude + 180) / span) % columns
+
+                # The number of columns either side which are within the radius, every
+                # column is searched near the poles
+                reach = math.cos(math.radians(min(90.0, abs(latitude) + span)))
+
+                if reach * columns <= 2 :
+
+                    searched = range(columns)
+
+                else :
 
-            threads.append(Thread(target=threaded_weather, kwargs={
-                "pos" : i, 
-                "thread_lock" : thread_lock, 
-                "latitude" : latitudes[i], 
-                "longitude" : longitudes[i], 
+                    width = math.ceil(1 / reach)
+
+                    searched = range(columns) if 2 * width + 1 >= columns else \
+                        [(column + offset) % columns for offset in range(-width, width + 1)]
+
+                cos_latitude = math.cos(math.radians(latitude))
+
+                for neighbour in (row - 1, row, row + 1) :
+
+                    for other_column in searched :
+
+                        for candidate in cells.get((neighbour, other_column), ()) :
+
+                            haversine = math.sin(math.radians(cluster_latitudes[candidate] - latitude) / 2) ** 2 +\
+                                cos_latitude * math.cos(math.radians(cluster_latitudes[candidate])) *\
+                                math.sin(math.radians(cluster_longitudes[candidate] - longitude) / 2) ** 2
+
+                            if haversine <= limit_haversine :
+
+                                cluster = candidate
+                                break
+
+                        if cluster != None :
+
+                            break
+
+                    if cluster != None :
+
+                        break
+
+            # The coordinate starts a new cluster if none is near enough
+            if cluster == None :
+
+                cluster = len(cluster_latitudes)
+
+                cluster_latitudes.append(latitude)
+                cluster_longitudes.append(longitude)
+
+                if span > 0 :
+
+                    cells.setdefault((row, column), []).append(cluster)
+
+            exact[(latitude, longitude)] = cluster
+            clusters.append(cluster)
+
+        return (cluster_latitudes, cluster_longitudes, clusters)
+
+
+    def expand(self, weather_list : list[Weather | WeatherRequestException], latitudes : list[float],\
+               longitudes : list[float], clusters : list[int]) -> list[Weather | WeatherRequestException]:
+        """
+        This method maps the weather data of each cluster back to every coordinate
+        in the cluster.
+
+        Parameters:
+            weather_list (list[Weather | WeatherRequestException]): the weather data, or
+            the exception raised, of each cluster.
+            latitudes (list[float]): a list of latitudes
+            longitudes (list[float]): a list of longitudes
+            clusters (list[int]): the cluster of each coordinate.
+
+        Returns:
+            list[Weather | WeatherRequestException]: the weather data, or the exception
+            raised, of each coordinate in order.
+        """
+
+        # The request fails if no weather data could be retrieved
+        if len(weather_list) > 0 and all(isinstance(weather, WeatherRequestException) for weather in weather_list) :
+
+            raise WeatherRequestException()
+
+        expanded = []
+
+        for latitude, longitude, cluster in zip(latitudes, longitudes, clusters) :
+
+            weather = weather_list[cluster]
+
+            # The shared data is returned with the requested coordinates
+            if isinstance(weather, Weather) and weather.coordinates != [latitude, longitude] :
+
+                weather = Weather(latitude, longitude, **weather.main, age=weather.age)
+
+            expanded.append(weather)
+
+        return expanded
+
+
+    async def current_weather_async(self, session : aiohttp.ClientSession, latitude : float,\
+                                    longitude : float, units : str = "metric") -> Weather:
+        """
+        This coroutine is the asynchronous counterpart of current_weather, the input
+        parameters are expected to have been validated.
+
+        Parameters:
+            session (aiohttp.ClientSession): the client session used to send the request.
+            latitude (float): the latitude
+            longitude (float): the latitude
+            units (str): an optional paramter to set the units, "metric" by default.
+
+        Returns:
+            Weather: A Weather object encapsulating the Weather data retrieved from the api.
+        """
+
+        # Cached weather data is returned if it is still valid, expired data within the
+        # stale window is returned immediately and refreshed in the background.
+        if self.cache != None :
+
+            weather, fresh = self.cache.lookup(latitude, longitude, units)
+
+            if weather != None :
+
+                if not fresh :
+
+                    self.revalidate(latitude, longitude, units)
+
+                return weather
+
+
+        # Concurrent identical requests are coalesced into a single upstream request
+        weather = await self.single_flight.do_async(self.flight_key(latitude, longitude, units),\
+                                                    self.request_weather_async, session, latitude,\
+                                                    longitude, units)
+
+        # A shared result is returned with the requested coordinates
+        if weather.coordinates != [latitude, longitude] :
+
+            weather = Weather(latitude, longitude, **weather.main)
+
+        return weather
+
+
+    async def request_weather_async(self, session : aiohttp.ClientSession, latitude : float,\
+                                    longitude : float, units : str) -> Weather:
+        """
+        This coroutine is the asynchronous counterpart of request_weather.
+
+        Parameters:
+            session (aiohttp.ClientSession): the client session used to send the request.
+            latitude (float): the latitude
+            longitude (float): the latitude
+            units (str): the units of the weather data.
+
+        Returns:
+            Weather: A Weather object encapsulating the Weather data retrieved from the api.
+        """
+
+        # The request is sent, network failures, unavailable hosts and exhausted quotas
+        # are reported as failed requests
+        try :
+
+            status, weather_data = await self.fan_out.get_json(session, self.URL, params = {
+                "appid" : self.api_key,
+                "lat" : latitude, 
+                "lon" : longitude,
                 "units" : units
-            }))
+                })
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, CircuitOpenException, RateLimitException) as e :
 
-            threads[i].start()
+            raise WeatherRequestException()
 
+        # The api response is validated
+        if status != requests.codes.ok :
 
-        # Join the threads to the main thread
-        for j in range(len(latitudes)) :
+            raise WeatherRequestException()
 
-            threads[j].join()
 
+        # A Weather object is created
+        weather = self.parse_weather(latitude, longitude, weather_data)
 
-        # Exception handling
-        for k in weather_list :
+        # The weather data is cached for subsequent requests
+        if self.cache != None :
 
-            if k == None :
+            self.cache.put(latitude, longitude, units, weather)
 
-                raise WeatherRequestException()
+        return weather
 
-        return weather_list
 
-        
+    def flight_key(self, latitude : float, longitude : float, units : str) -> tuple[float, float, str]:
+        """
+        This method generates the key used to coalesce identical requests, requests
+        which share a cache entry are considered identical.
 
-        
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the latitude
+            units (str): the units of the weather data.
 
+        Returns:
+            tuple[float, float, str]: the request key.
+        """
 
-        
-        
+        if self.cache != None :
 
-                
+            return self.cache.key(latitude, longitude, units)
 
-            
+        return (latitude, longitude, units)
 
 
+    def parse_weather(self, latitude : float, longitude : float, weather_data : dict) -> Weather:
+        """
+        This method creates a Weather object from an OpenWeather API response.
 
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the latitude
+            weather_data (dict): the decoded json response.
 
+        Returns:
+            Weather: A Weather object encapsulating the Weather data.
+        """
 
+        return Weather(
+            latitude, 
+            longitude,
+            weather_data.get("main", dict()).get("temp", None),
+            weather_data.get("main", dict()).get("temp_min", None),
+            weather_data.get("main", dict()).get("temp_max", None), 
+            weather_data.get("main", dict()).get("feels_like", None),
+            weather_data.get("main", dict()).get("humidity", None),
+            weather_data.get("weather", [dict()])[0].get("description", None),
+            weather_data.get("wind", dict()).get("speed", None),
+            weather_data.get("rain", dict()).get("1h", None),
+            weather_data.get("visibility", None)
+        )
+
+
+    def validate_bulk(self, latitudes : list[float], longitudes : list[float], units : str) -> None:
+        """
+        This method validates the parameters of a bulk weather request.
+
+        Parameters:
+            latitudes (list[float]): a list of latitudes
+            longitudes (list[float]): a list of longitudes
+            units (str): the units of the weather data.
+        """
+
+        # Raise TypeError for invalid input type
+        if (not isinstance(latitudes, list)) or (not isinstance(longitudes, list)) :
+
+            raise TypeError("Invalid parameters, a list of latitudes and a list of longitudes" +\
+                            " is required.")
         
-        
 
+        # Raise ValueError when the number of latitude and longitude values is unequal.
+        if len(latitudes) != len(longitudes) :
+
+            raise ValueError("Invalid parameters, the number of latitude and longitude values" +\
+                             " must be the same.")
+
+
+        # Raise TypeError for invalid input type
+        for i in range(len(latitudes)) :
+
+            if (not isinstance(latitudes[i], float)) or (not isinstance(longitudes[i], float)) :
+
+                raise TypeError("The latitudes and longitudes must be valid numerical values (floats).")
+        
 
+        # Raise InvalidLocationException if the coordinates are invalid
+        for i in range(len(latitudes)) :
 
+            if latitudes[i] < -90 or latitudes[i] > 90 or longitudes[i] < -180  or longitudes[i] > 180 :
 
+                raise InvalidLocationException((latitudes[i], longitudes[i]))
         
 
+        # Input units validation
+        if (not isinstance(units, str)) :
+
+            raise TypeError("Invalid argument, the units value should be a string.")
         
-        
\ No newline at end of file
+
+        # Unit type is validated
+        if units not in {"metric", "imperial"} :
+
+            raise InvalidUnitException(units)
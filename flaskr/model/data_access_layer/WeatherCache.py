@@ -0,0 +1,192 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from flaskr.model.Weather import Weather
+
+
+class WeatherCache :
+    """
+    This class provides a bounded, thread-safe, in-memory cache of Weather data.
+    Entries are keyed by quantized coordinates and units, expire after a fixed
+    time-to-live and the least recently used entry is evicted when full. Expired
+    entries may still be looked up for a stale window while they are refreshed.
+    """
+
+
+    def __init__(self, ttl : float = 600, max_entries : int = 4096, precision : int = 2,\
+                 stale : float = 0) -> None :
+        """
+        WeatherCache object initializer
+
+        Parameters:
+            ttl (float): the number of seconds an entry remains valid.
+            max_entries (int): the maximum number of entries held in the cache.
+            precision (int): the number of decimal places coordinates are rounded
+            to, 2 decimal places is roughly 1km.
+            stale (float): the number of seconds an expired entry may still be served
+            while it is refreshed.
+        """
+
+        # Input validation
+        if ttl <= 0 or max_entries <= 0 or precision < 0 or stale < 0 :
+
+            raise ValueError("Invalid cache configuration: ttl and max_entries must be positive" +\
+                             " and precision and stale must not be negative.")
+
+        self.ttl : float = ttl
+        self.max_entries : int = max_entries
+        self.precision : int = precision
+        self.stale : float = stale
+
+        self.entries : OrderedDict[tuple[float, float, str], tuple[float, Weather]] = OrderedDict()
+        self.lock : Lock = Lock()
+
+
+    def key(self, latitude : float, longitude : float, units : str) -> tuple[float, float, str] :
+        """
+        This method generates the cache key for a set of coordinates.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the longitude
+            units (str): the units of the weather data.
+
+        Returns:
+            tuple[float, float, str]: the quantized coordinates and units.
+        """
+
+        return (round(latitude, self.precision), round(longitude, self.precision), units)
+
+
+    def get(self, latitude : float, longitude : float, units : str) -> Weather | None :
+        """
+        This method retrieves cached weather data if a valid entry exists.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the longitude
+            units (str): the units of the weather data.
+
+        Returns:
+            Weather | None: a Weather object for the requested coordinates or None
+            if no valid entry exists.
+        """
+
+        weather, fresh = self.lookup(latitude, longitude, units)
+
+        return weather if fresh else None
+
+
+    def lookup(self, latitude : float, longitude : float, units : str) -> tuple[Weather | None, bool] :
+        """
+        This method retrieves cached weather data which is valid or has expired within
+        the stale window.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the longitude
+            units (str): the units of the weather data.
+
+        Returns:
+            tuple[Weather | None, bool]: a Weather object for the requested coordinates
+            or None if no entry exists, and True if the entry is still valid.
+        """
+
+        key = self.key(latitude, longitude, units)
+
+        with self.lock :
+
+            entry = self.entries.get(key, None)
+
+            if entry == None :
+
+                return (None, False)
+
+            age = monotonic() - entry[0]
+
+            # Entries are discarded once the stale window has passed
+            if age > self.ttl + self.stale :
+
+                del self.entries[key]
+
+                return (None, False)
+
+            self.entries.move_to_end(key)
+
+        # The cached data is returned with the requested coordinates since
+        # nearby coordinates share a single entry.
+        return (Weather(latitude, longitude, **entry[1].main, age=int(age)), age <= self.ttl)
+
+
+    def expires_in(self, latitude : float, longitude : float, units : str) -> float | None :
+        """
+        This method finds how long a cache entry remains valid, the entry isn't
+        treated as recently used.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the longitude
+            units (str): the units of the weather data.
+
+        Returns:
+            float | None: the number of seconds until the entry expires, negative once
+            it has expired, or None if no entry exists.
+        """
+
+        key = self.key(latitude, longitude, units)
+
+        with self.lock :
+
+            entry = self.entries.get(key, None)
+
+        if entry == None :
+
+            return None
+
+        return self.ttl - (monotonic() - entry[0])
+
+
+    def put(self, latitude : float, longitude : float, units : str, weather : Weather) -> None :
+        """
+        This method stores weather data in the cache.
+
+        Parameters:
+            latitude (float): the latitude
+            longitude (float): the longitude
+            units (str): the units of the weather data.
+            weather (Weather): the weather data to be cached.
+        """
+
+        key = self.key(latitude, longitude, units)
+
+        with self.lock :
+
+            self.entries[key] = (monotonic(), weather)
+            self.entries.move_to_end(key)
+
+            # The least recently used entries are evicted
+            while len(self.entries) > self.max_entries :
+
+                self.entries.popitem(last=False)
+
+
+    def clear(self) -> None :
+        """
+        This method removes all entries from the cache.
+        """
+
+        with self.lock :
+
+            self.entries.clear()
+
+
+    def __len__(self) -> int :
+        """
+        This method returns the number of entries in the cache.
+
+        Returns:
+            int: the number of cached entries.
+        """
+
+        return self.entries.__len__()
@@ -0,0 +1,222 @@
+import logging
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from flaskr.model.exceptions.WeatherRequestException import WeatherRequestException
+from flaskr.model.data_access_layer.SpatialIndex import SpatialIndex
+from flaskr.model.data_access_layer.WeatherAPIConnector import WeatherAPIConnector
+
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherRefresher :
+    """
+    This class refreshes the cached weather data of every saved itinerary location in
+    the background before it expires. The locations are taken from the spatial
+    index, so the itineraries aren't parsed again or pushed out of the itinerary
+    cache. The locations of recently viewed itineraries are refreshed first, and the
+    upstream requests are spread evenly at a fixed rate so the refresher only uses
+    its share of the OpenWeather quota.
+    """
+
+
+    def __init__(self, weather : WeatherAPIConnector,\
+                 itineraries : "ItineraryConnector | SQLiteItineraryConnector", index : SpatialIndex,\
+                 rate : float = 30, lead : float = 120, period : float = 60, units : tuple[str, ...] = ("metric",),\
+                 max_viewed : int = 1000) -> None :
+        """
+        WeatherRefresher object initializer
+
+        Parameters:
+            weather (WeatherAPIConnector): the weather connector, it must have a cache.
+            itineraries (ItineraryConnector | SQLiteItineraryConnector): the itinerary
+            connector the saved itineraries are listed by.
+            index (SpatialIndex): the spatial index the saved locations are read from.
+            rate (float): the maximum number of upstream requests per minute, the
+            refresher doesn't start if 0.
+            lead (float): the number of seconds before it expires that an entry is
+            refreshed.
+            period (float): the number of seconds between passes over the locations.
+            units (tuple[str, ...]): the units the weather data is refreshed in.
+            max_viewed (int): the number of recently viewed itineraries remembered.
+        """
+
+        # Input validation
+        if weather.cache == None :
+
+            raise ValueError("Invalid refresher configuration: the weather connector must have a cache.")
+
+        if rate < 0 or lead < 0 or period < 0 or max_viewed <= 0 :
+
+            raise ValueError("Invalid refresher configuration: max_viewed must be positive and rate," +\
+                             " lead and period must not be negative.")
+
+        self.weather : WeatherAPIConnector = weather
+        self.itineraries : "ItineraryConnector | SQLiteItineraryConnector" = itineraries
+        self.index : SpatialIndex = index
+        self.rate : float = rate
+        self.lead : float = lead
+        self.period : float = period
+        self.units : tuple[str, ...] = tuple(units)
+        self.max_viewed : int = max_viewed
+
+        # The recently viewed itinerary names, most recent last
+        self.viewed_names : OrderedDict[str, None] = OrderedDict()
+        self.lock : Lock = Lock()
+
+        # The monotonic time at which the next upstream request may be sent
+        self.next_request : float = 0.0
+
+        self.stopped : Event = Event()
+        self.thread : Thread | None = None
+
+
+    def viewed(self, name : str) -> None :
+        """
+        This method records that an itinerary has been viewed, its locations are
+        refreshed first on the next pass.
+
+        Parameters:
+            name (str): the name of the itinerary.
+        """
+
+        with self.lock :
+
+            self.viewed_names[name] = None
+            self.viewed_names.move_to_end(name)
+
+            # The least recently viewed names are forgotten
+            while len(self.viewed_names) > self.max_viewed :
+
+                self.viewed_names.popitem(last=False)
+
+
+    def names(self) -> list[str] :
+        """
+        This method orders the saved itinerary names by priority, the most recently
+        viewed itineraries come first.
+
+        Returns:
+            list[str]: the itinerary names in the order they are refreshed.
+        """
+
+        with self.lock :
+
+            viewed = list(reversed(self.viewed_names))
+
+        names = self.itineraries.get_names()
+        saved = set(names)
+        first = set(viewed)
+
+        return [name for name in viewed if name in saved] + [name for name in names if name not in first]
+
+
+    def refresh(self) -> int :
+        """
+        This method makes a single pass over the saved locations and refreshes the
+        weather data which is missing or about to expire.
+
+        Returns:
+            int: the number of locations refreshed.
+        """
+
+        cache = self.weather.cache
+        refreshed = 0
+
+        # Locations which share a cache entry are only refreshed once
+        seen = set()
+
+        for name in self.names() :
+
+            locations = self.index.locations(name)
+
+            # Itineraries which aren't indexed yet, or were deleted since they were
+            # listed, are skipped
+            if locations == None :
+
+                continue
+
+            for latitude, longitude in locations :
+
+                for units in self.units :
+
+                    key = cache.key(latitude, longitude, units)
+
+                    if key in seen :
+
+                        continue
+
+                    seen.add(key)
+
+                    remaining = cache.expires_in(latitude, longitude, units)
+
+                    if remaining != None and remaining > self.lead :
+
+                        continue
+
+                    # The requests are spread evenly, the pass ends if the refresher stops
+                    if self.stopped.wait(max(0.0, self.next_request - monotonic())) :
+
+                        return refreshed
+
+                    self.next_request = monotonic() + 60 / self.rate
+
+                    # Failed requests are retried on the next pass
+                    try :
+
+                        self.weather.refresh_weather(latitude, longitude, units)
+
+                    except WeatherRequestException as e :
+
+                        continue
+
+                    refreshed += 1
+
+        return refreshed
+
+
+    def run(self) -> None :
+        """
+        This method refreshes the saved locations until the refresher is stopped.
+        """
+
+        while not self.stopped.is_set() :
+
+            # A failed pass is retried after the period, the refresher keeps running
+            try :
+
+                self.refresh()
+
+            except Exception as e :
+
+                logger.exception("The weather refresh pass failed")
+
+            self.stopped.wait(self.period)
+
+
+    def start(self) -> None :
+        """
+        This method starts refreshing the saved locations on a background thread.
+        """
+
+        if self.thread == None and self.rate > 0 :
+
+            self.stopped.clear()
+
+            self.thread = Thread(target=self.run, name="weather-refresher", daemon=True)
+            self.thread.start()
+
+
+    def stop(self) -> None :
+        """
+        This method stops the background thread once its current request is complete.
+        """
+
+        self.stopped.set()
+
+        if self.thread != None :
+
+            self.thread.join()
+            self.thread = None
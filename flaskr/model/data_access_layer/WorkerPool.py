@@ -0,0 +1,132 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+
+class WorkerPool :
+    """
+    This class provides a shared, bounded pool of worker threads which is used to
+    fan out blocking requests. Threads are reused between requests and each request
+    is limited in the number of workers it may occupy at once.
+    """
+
+
+    def __init__(self, max_workers : int = 32, max_concurrency : int = 8) -> None :
+        """
+        WorkerPool object initializer
+
+        Parameters:
+            max_workers (int): the total number of worker threads.
+            max_concurrency (int): the default number of tasks a single request may
+            run at once.
+        """
+
+        # Input validation
+        if max_workers <= 0 or max_concurrency <= 0 :
+
+            raise ValueError("Invalid pool configuration: max_workers and max_concurrency" +\
+                             " must be positive.")
+
+        self.max_workers : int = max_workers
+        self.max_concurrency : int = max_concurrency
+        self.executor : ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix="worker")
+
+
+    def imap(self, function : Callable[..., Any], arguments : Iterable[tuple],
+             limit : int | None = None) -> Iterator[Future] :
+        """
+        This method runs a function once per set of arguments and yields the completed
+        futures in the order the arguments were given. No more than limit tasks are
+        submitted to the pool at any one time.
+
+        Parameters:
+            function (Callable): the function to be run.
+            arguments (Iterable[tuple]): the positional arguments of each call.
+            limit (int | None): the maximum number of concurrent tasks, by default the
+            pool's max_concurrency.
+
+        Returns:
+            Iterator[Future]: the completed futures in order.
+        """
+
+        if limit == None or limit <= 0 :
+
+            limit = self.max_concurrency
+
+        pending : deque[Future] = deque()
+        arguments = iter(arguments)
+
+        try :
+
+            # The window is filled
+            for args in arguments :
+
+                pending.append(self.executor.submit(function, *args))
+
+                if len(pending) >= limit :
+
+                    break
+
+            # Each completed task is replaced with the next one
+            while len(pending) > 0 :
+
+                future = pending.popleft()
+                future.exception()
+
+                for args in arguments :
+
+                    pending.append(self.executor.submit(function, *args))
+
+                    break
+
+                yield future
+
+        finally :
+
+            # Outstanding tasks are cancelled if the caller stops early
+            for future in pending :
+
+                future.cancel()
+
+
+    def map(self, function : Callable[..., Any], arguments : Iterable[tuple],
+            limit : int | None = None) -> list[Any] :
+        """
+        This method runs a function once per set of arguments and returns the results
+        in order. The first exception raised by a task is re-raised.
+
+        Parameters:
+            function (Callable): the function to be run.
+            arguments (Iterable[tuple]): the positional arguments of each call.
+            limit (int | None): the maximum number of concurrent tasks.
+
+        Returns:
+            list[Any]: the results of each call.
+        """
+
+        return [future.result() for future in self.imap(function, arguments, limit)]
+
+
+    def submit(self, function : Callable[..., Any], *args : Any) -> Future :
+        """
+        This method runs a single task in the background, the caller doesn't wait for
+        its result.
+
+        Parameters:
+            function (Callable): the function to be run.
+            args (Any): the arguments of the function.
+
+        Returns:
+            Future: the future of the task.
+        """
+
+        return self.executor.submit(function, *args)
+
+
+    def shutdown(self) -> None :
+        """
+        This method stops the worker threads once outstanding tasks are complete.
+        """
+
+        self.executor.shutdown(wait=True, cancel_futures=True)
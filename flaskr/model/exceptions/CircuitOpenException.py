@@ -0,0 +1,35 @@
+class CircuitOpenException(Exception) :
+    """
+    This exception class is a custom class, specific to the HTTPClient class - and
+    is raised when requests to an upstream host are refused because the host has
+    recently failed repeatedly.
+    """
+
+    def __init__(self, host : str) -> None:
+        """
+        CircuitOpenException object initializer
+
+        Parameter:
+            host (str): The upstream host.
+        """
+
+        self.host : str = host
+        super().__init__()
+
+
+    def __str__(self) -> str:
+        """
+        This method displays a plain text description of the exception's
+        cause.
+        """
+
+        return f"The upstream service {self.host} is currently unavailable."
+    
+
+    def __repr__(self) -> str:
+        """
+        This method displays a plain text description of the exception's intialization
+        for debugging purposes.
+        """
+
+        return f"CircuitOpenException({self.host})"
\ No newline at end of file
@@ -0,0 +1,36 @@
+
+# This exception class is a custom class, specific to the Itinerary
+# data structure - and is raised when one or more locations of a bulk
+# constructed itinerary are invalid, every invalid location is reported.
+class InvalidItineraryException(Exception) :
+    
+    # Constructor
+    def __init__(self, errors : list[str]) -> None:
+        """
+        InvalidItineraryException object initializer
+
+        Parameter:
+            errors (list[str]): The plain text description of each invalid location.
+        """
+
+        self.errors : list[str] = errors
+        super().__init__()
+
+
+    def __str__(self) -> str:
+        """
+        This method displays a plain text description of the exception's
+        cause.
+        """
+
+        return f"The itinerary is invalid, {len(self.errors)} location(s) were rejected: " +\
+                "; ".join(self.errors) + "."
+    
+
+    def __repr__(self) -> str:
+        """
+        This method displays a plain text description of the exception's intialization
+        for debugging purposes.
+        """
+
+        return f"InvalidItineraryException({self.errors})"
\ No newline at end of file
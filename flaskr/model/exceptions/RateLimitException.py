@@ -0,0 +1,35 @@
+class RateLimitException(Exception) :
+    """
+    This exception class is a custom class, specific to the RateLimiter class - and
+    is raised when a request to an upstream host is shed because the host's quota
+    wouldn't allow it to be sent soon enough.
+    """
+
+    def __init__(self, host : str) -> None:
+        """
+        RateLimitException object initializer
+
+        Parameter:
+            host (str): The upstream host.
+        """
+
+        self.host : str = host
+        super().__init__()
+
+
+    def __str__(self) -> str:
+        """
+        This method displays a plain text description of the exception's
+        cause.
+        """
+
+        return f"The request quota of the upstream service {self.host} has been exhausted."
+    
+
+    def __repr__(self) -> str:
+        """
+        This method displays a plain text description of the exception's intialization
+        for debugging purposes.
+        """
+
+        return f"RateLimitException({self.host})"
\ No newline at end of file
@@ -123,6 +123,13 @@ function addMarkers(coordinates, weather){
         let location = coordinates[i][0]
         let data = weather[i];
 
+        // Locations whose weather couldn't be retrieved are shown without it
+        let description = "Weather data is currently unavailable";
+
+        if(!("error" in data)){
+            description = `Currently ${data["main"]["description"]} with a temperature of ${data["main"]["current_temp"]}°C`;
+        }
+
         // Custom html marker element
         let customMarker = document.createElement("div")
         customMarker.className = "markerBox";
@@ -130,7 +137,7 @@ function addMarkers(coordinates, weather){
         `   
             <div class="weather-marker">
                 <h2>${i+1}: ${location}</h2>
-                <p>Currently ${data["main"]["description"]} with a temperature of ${data["main"]["current_temp"]}°C</p>
+                <p>${description}</p>
             </div>
             <div class="down-arrow"></div>
         `
@@ -171,24 +178,25 @@ async function getItineraryNames(){
 
 
 /**
- * This function retrieves itinerary from the API
+ * This function retrieves an itinerary and the weather data of each of its
+ * locations from the API in a single request.
  * 
  * @param {string} name The name of the itinerary to retrieve.
  * 
  */ 
-async function getItinerary(name){
+async function getItineraryWeather(name){
 
     // Input Validation
     if(typeof(name) != "string"){
         throw new TypeError("Invalid input parameters: name => string.");
     }
 
-    // The itinerary is retrieved via the api
-    let response = await fetch(API_URL + `/itineraries/${name}`, {method : "GET"});
+    // The itinerary and weather are retrieved via the api
+    let response = await fetch(API_URL + `/itineraries/${name}/weather`, {method : "GET"});
 
     // The response is validated.
     if(!response.ok){
-        throw new Error("Something went wrong while requesting the list of itineraries.");
+        throw new Error("Something went wrong while retrieving the itinerary and its weather information.");
     }
 
     let data = await response.json();
@@ -256,46 +264,6 @@ async function deleteItinerary(name){
 
 
 
-//////////////////////////////////////////////////////////////////////////
-////////////////////////// Weather API functions /////////////////////////
-//////////////////////////////////////////////////////////////////////////
-
-
-/**
- * This function retrieves the weather data for all the input data points.
- * 
- * @param {Array} coordinates The coordinates by which the weather data
- * is being retrieved. The format here is [[lat, lng]].
- */
-async function getWeather(coordinates){
-
-    // Input Validation
-    if(!(coordinates instanceof Array)){
-        throw new TypeError("Invalid input parameter: itinerary => Array.");
-    }
-
-    // The url parameters are set.
-    let params = `?lat=${coordinates[0][1]}&lng=${coordinates[0][2]}`;
-
-    for(let i=1; i<coordinates.length; i++){
-        params += `&lat=${coordinates[i][1]}&lng=${coordinates[i][2]}`
-    }
-
-    // Weather request 
-    let response = await fetch(API_URL + `/weather` + params, {method : "GET"});
-
-    // Response validation
-    if(!response.ok){
-        throw new Error("Something went wrong while retrieving the weather information.");
-    }
-
-    let data = await response.json()
-
-    return data["weather-data"]
-}
-
-
-
 //////////////////////////////////////////////////////////////////////////
 ////////////////////////// Geocode API functions /////////////////////////
 //////////////////////////////////////////////////////////////////////////
@@ -335,11 +303,10 @@ async function getCoordinates(location){
 // This function displays the map, itinerary and weather data.
 async function loadItinerary(name){
 
-    let itinerary = await getItinerary(name);
-    let weather = await getWeather(itinerary["coordinates"]);
+    let itinerary = await getItineraryWeather(name);
     createMap(itinerary["center"]);
     addDirections(itinerary["coordinates"]);
-    addMarkers(itinerary["coordinates"], weather);
+    addMarkers(itinerary["coordinates"], itinerary["weather-data"]);
 
 }
 